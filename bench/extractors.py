@@ -0,0 +1,108 @@
+# extractors.py
+"""
+对比新旧正文提取器：在 fixtures 页面上比较提取结果的句子召回率、精确率和耗时，
+并在不同规模的深层嵌套页面上验证耗时随页面大小线性增长：
+
+    python -m bench.extractors
+    python -m bench.extractors --min-recall 0.9 --parser html.parser
+
+召回率低于 --min-recall 或新提取器的耗时增长明显超过线性时以非零状态退出。
+"""
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import config
+import parsers
+from utils import decode_content, extract_page_content
+
+FIXTURES = Path(__file__).parent / 'fixtures' / 'pages'
+
+_SENTENCE_RE = re.compile(r'(?<=[。！？；!?;.])')
+
+def sentences(text):
+    """
+    按句末标点切分，并去掉空白后比较，忽略两个提取器在块之间分隔符上的差异。
+    """
+    return {''.join(s.split()) for s in _SENTENCE_RE.split(text) if len(''.join(s.split())) >= 8}
+
+def run_extractor(name, text, number=3):
+    config.EXTRACTOR = name
+    started = time.perf_counter()
+    for _ in range(number):
+        result = extract_page_content(text)
+    return result, (time.perf_counter() - started) / number
+
+def compare_corpus(pages, min_recall):
+    print(f"{'页面':<20}{'旧长度':>8}{'新长度':>8}{'召回率':>8}{'精确率':>8}{'旧(ms)':>10}{'新(ms)':>10}")
+    ok = True
+    for name, text in pages:
+        legacy, legacy_time = run_extractor('legacy', text)
+        density, density_time = run_extractor('density', text)
+        expected, actual = sentences(legacy), sentences(density)
+        recall = len(expected & actual) / len(expected) if expected else 1.0
+        precision = len(expected & actual) / len(actual) if actual else 1.0
+        ok = ok and recall >= min_recall
+        print(
+            f"{name:<22}{len(legacy):>8}{len(density):>8}{recall:>8.2f}{precision:>8.2f}"
+            f"{legacy_time * 1000:>10.2f}{density_time * 1000:>10.2f}"
+        )
+    return ok
+
+def nested_page(depth):
+    """
+    构造深层嵌套的页面：depth 层没有文字的 div，正文不足200字。
+    旧提取器的回退逻辑会对每个 div 调用 get_text，总耗时随深度平方增长。
+    """
+    return (
+        '<html><body>' + '<div>' * depth + '</div>' * depth
+        + '<p>' + '这是一段较短的正文内容，用于检查提取结果。' * 4 + '</p></body></html>'
+    )
+
+def check_scaling(depths, parser):
+    """
+    比较每个节点的平均耗时：线性算法在页面规模翻倍时单节点耗时应基本不变。
+    """
+    previous = parsers.HTML_PARSER
+    parsers.HTML_PARSER = parser
+    print(f"\n嵌套深度  {'旧(ms)':>10}{'新(ms)':>10}{'旧/节点(us)':>14}{'新/节点(us)':>14}  解析器 {parser}")
+    per_node = []
+    try:
+        for depth in depths:
+            text = nested_page(depth)
+            _, legacy_time = run_extractor('legacy', text, number=1)
+            _, density_time = run_extractor('density', text, number=1)
+            per_node.append(density_time / depth)
+            print(
+                f"{depth:>8}  {legacy_time * 1000:>10.1f}{density_time * 1000:>10.1f}"
+                f"{legacy_time / depth * 1e6:>14.2f}{density_time / depth * 1e6:>14.2f}"
+            )
+    finally:
+        parsers.HTML_PARSER = previous
+    # 允许测量噪声，单节点耗时增长超过3倍视为非线性
+    return per_node[-1] <= per_node[0] * 3
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='新旧正文提取器的回归对比')
+    parser.add_argument('--min-recall', type=float, default=0.9, help='新提取器相对旧提取器的最低句子召回率')
+    parser.add_argument('--parser', default='html.parser', help='嵌套页面测试使用的解析器(lxml 对嵌套深度有限制)')
+    parser.add_argument('--depths', default='500,1000,2000,4000')
+    args = parser.parse_args(argv)
+
+    pages = [
+        (path.stem, decode_content(path.read_bytes(), 'text/html'))
+        for path in sorted(FIXTURES.glob('*.html'))
+    ]
+    recall_ok = compare_corpus(pages, args.min_recall)
+    linear_ok = check_scaling([int(depth) for depth in args.depths.split(',')], args.parser)
+
+    if not recall_ok:
+        print(f"新提取器召回率低于 {args.min_recall}")
+    if not linear_ok:
+        print("新提取器耗时随页面规模的增长超过线性")
+    sys.exit(0 if recall_ok and linear_ok else 1)
+
+if __name__ == '__main__':
+    main()
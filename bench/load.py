@@ -0,0 +1,219 @@
+# load.py
+"""
+对 /search 接口施加负载，按不同并发级别统计吞吐、延迟百分位和服务进程内存。
+
+未指定 --app-url 时自动启动桩服务器和服务进程，搜索引擎地址指向桩服务器：
+
+    python -m bench.load --concurrency 1,8,32 --requests 200
+
+也可以对已运行的服务施压(此时不统计内存)：
+
+    python -m bench.load --app-url http://127.0.0.1:8000 --concurrency 16
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import subprocess
+import urllib.parse
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+def process_memory(pid):
+    """
+    读取进程当前和峰值常驻内存(MB)，仅支持Linux，无法读取时返回 (None, None)。
+    """
+    try:
+        status = Path(f'/proc/{pid}/status').read_text()
+    except OSError:
+        return None, None
+    values = {}
+    for line in status.splitlines():
+        name, _, value = line.partition(':')
+        if name in ('VmRSS', 'VmHWM'):
+            values[name] = round(int(value.split()[0]) / 1024, 1)
+    return values.get('VmRSS'), values.get('VmHWM')
+
+def wait_ready(url, process, timeout=30, interval=0.2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"进程已退出: {' '.join(process.args)}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(interval)
+    raise RuntimeError(f"等待 {url} 就绪超时")
+
+def start_stub(args, processes):
+    """
+    启动桩服务器，返回指向它的搜索引擎地址环境变量；启动的子进程追加到 processes 中。
+    """
+    stub_cmd = [
+        sys.executable, '-m', 'bench.stub_server', '--port', '0', '--ports', str(args.stub_ports),
+        '--serp-latency-ms', str(args.serp_latency_ms), '--latency-ms', str(args.latency_ms),
+        '--size-kb', str(args.size_kb), '--error-rate', str(args.error_rate)
+    ]
+    stub = subprocess.Popen(stub_cmd, cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    processes.append(stub)
+    stub_env = {}
+    for _ in range(3):
+        name, _, value = stub.stdout.readline().strip().partition('=')
+        stub_env[name] = value
+    stub_port = urllib.parse.urlsplit(stub_env['GOOGLE_SEARCH_URL']).port
+    wait_ready(f'http://127.0.0.1:{stub_port}/', stub)
+    return stub_env
+
+def start_app(stub_env, app_env, processes, interval=0.2):
+    """
+    启动服务进程并等待就绪，返回 (服务地址, 服务进程)；app_env 为 KEY=VALUE 列表。
+    """
+    app_port = free_port()
+    # 默认关闭限流，测量服务本身的处理能力；可通过 --app-env 覆盖
+    env = dict(
+        os.environ, CACHE_BACKEND='memory', ENGINE_RATE_LIMIT='0', HOST_RATE_LIMIT='0', **stub_env
+    )
+    for item in app_env:
+        name, _, value = item.partition('=')
+        env[name] = value
+    app = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(app_port), '--log-level', 'warning'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    processes.append(app)
+    app_url = f'http://127.0.0.1:{app_port}'
+    wait_ready(app_url + '/', app, interval=interval)
+    return app_url, app
+
+def start_services(args, processes):
+    """
+    启动桩服务器和服务进程，返回 (服务地址, 服务进程)；启动的子进程追加到 processes 中。
+    """
+    return start_app(start_stub(args, processes), args.app_env, processes)
+
+async def run_level(client, args, concurrency, level):
+    """
+    以 concurrency 个并发请求发送 args.requests 个搜索请求，返回统计结果。
+    """
+    rng = random.Random(level)
+    hot = [f'bench hot query {i}' for i in range(10)]
+    latencies = []
+    statuses = {}
+    counter = iter(range(args.requests))
+
+    def next_body(i):
+        queries = [
+            rng.choice(hot) if rng.random() < args.repeat else f'bench query {level}-{i}-{k}'
+            for k in range(args.queries_per_request)
+        ]
+        return {
+            'queries': queries,
+            'num_results': args.num_results,
+            'engine': args.engine,
+            'no_cache': args.no_cache
+        }
+
+    async def worker():
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                response = await client.post('/search', json=next_body(i))
+                status = response.json().get('status', str(response.status_code)) \
+                    if response.status_code == 200 else str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        'concurrency': concurrency,
+        'requests': args.requests,
+        'elapsed': round(elapsed, 2),
+        'throughput': round(args.requests / elapsed, 2),
+        'p50': round(percentile(latencies, 50), 3),
+        'p95': round(percentile(latencies, 95), 3),
+        'p99': round(percentile(latencies, 99), 3),
+        'statuses': statuses
+    }
+
+async def run(args, app_url, app_pid):
+    levels = [int(level) for level in args.concurrency.split(',')]
+    reports = []
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=app_url, timeout=args.timeout, limits=limits) as client:
+        for level, concurrency in enumerate(levels):
+            report = await run_level(client, args, concurrency, level)
+            report['rss_mb'], report['peak_rss_mb'] = process_memory(app_pid) if app_pid else (None, None)
+            reports.append(report)
+            print(
+                f"并发 {concurrency:>4}  吞吐 {report['throughput']:>8} req/s  "
+                f"p50 {report['p50']:>7}s  p95 {report['p95']:>7}s  p99 {report['p99']:>7}s  "
+                f"内存 {report['rss_mb']}MB(峰值 {report['peak_rss_mb']}MB)  {report['statuses']}",
+                flush=True
+            )
+    return reports
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='/search 接口负载测试')
+    parser.add_argument('--app-url', help='已运行的服务地址；不指定时自动启动桩服务器和服务')
+    parser.add_argument('--concurrency', default='1,8,32', help='逗号分隔的并发级别')
+    parser.add_argument('--requests', type=int, default=200, help='每个并发级别发送的请求数')
+    parser.add_argument('--queries-per-request', type=int, default=1)
+    parser.add_argument('--num-results', type=int, default=5)
+    parser.add_argument('--engine', default='Google')
+    parser.add_argument('--repeat', type=float, default=0.0, help='从10个热门查询中抽取的比例，用于测试缓存命中')
+    parser.add_argument('--no-cache', action='store_true', help='请求中设置 no_cache')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--stub-ports', type=int, default=8, help='桩服务器模拟的站点数')
+    parser.add_argument('--serp-latency-ms', type=float, default=200)
+    parser.add_argument('--latency-ms', type=float, default=80)
+    parser.add_argument('--size-kb', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--app-env', action='append', default=[], metavar='KEY=VALUE',
+                        help='传给服务进程的环境变量，可重复指定')
+    parser.add_argument('--json', help='将结果写入JSON文件')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    processes = []
+    try:
+        if args.app_url:
+            app_url, app_pid = args.app_url, None
+        else:
+            app_url, app = start_services(args, processes)
+            app_pid = app.pid
+        reports = asyncio.run(run(args, app_url, app_pid))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(reports, ensure_ascii=False, indent=2), encoding='utf-8')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# micro.py
+"""
+CPU密集函数的微基准测试，输入来自 fixtures 中录制的页面：
+
+    python -m bench.micro
+    python -m bench.micro --filter parse --repeat 7
+"""
+import re
+import time
+import timeit
+import argparse
+import statistics
+from pathlib import Path
+
+import parsers
+from search_engines import (
+    process_search_query, parse_google_results, parse_bing_results, parse_baidu_results
+)
+from utils import clean_text, extract_page_bytes, extract_page_content, decode_content
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+
+QUERIES = [
+    'python asyncio tutorial',
+    '"connection pooling" -java site:example.com filetype:pdf',
+    'intitle:benchmark inurl:lxml define:parser related:example.com 2010..2020 time:last7days',
+    '上海 天气 预报',
+]
+
+SERP_PARSERS = {
+    'google': parse_google_results,
+    'bing': parse_bing_results,
+    'baidu': parse_baidu_results,
+}
+
+def available_parsers():
+    names = ['html.parser']
+    if parsers.resolve_parser('lxml') == 'lxml':
+        names.insert(0, 'lxml')
+    return names
+
+def benchmarks():
+    """
+    生成 (名称, 无参函数) 列表。
+    """
+    cases = []
+    cases.append(('process_search_query', lambda: [process_search_query(q) for q in QUERIES]))
+
+    serps = {path.stem: path.read_text(encoding='utf-8') for path in sorted((FIXTURES / 'serp').glob('*.html'))}
+    pages = {path.stem: path.read_bytes() for path in sorted((FIXTURES / 'pages').glob('*.html'))}
+
+    for parser in available_parsers():
+        for name, text in serps.items():
+            cases.append((f'parse_{name}[{parser}]', with_parser(parser, SERP_PARSERS[name], text, 10)))
+        for name, content in pages.items():
+            text = decode_content(content, 'text/html')
+            cases.append((f'extract_page_content:{name}[{parser}]', with_parser(parser, extract_page_content, text)))
+
+    for name, content in pages.items():
+        cases.append((f'extract_page_bytes:{name}', lambda content=content: extract_page_bytes(content, 'text/html')))
+
+    for name, content in pages.items():
+        # 以整页解码后的HTML作为输入，比提取后的正文规模更大
+        text = decode_content(content, 'text/html')
+        cases.append((f'clean_text:{name}', lambda text=text: clean_text(text)))
+    return cases
+
+def with_parser(parser, func, *args):
+    def run():
+        previous = parsers.HTML_PARSER
+        parsers.HTML_PARSER = parser
+        try:
+            return func(*args)
+        finally:
+            parsers.HTML_PARSER = previous
+    return run
+
+def measure(func, repeat):
+    """
+    返回每次调用耗时的中位数和最小值(秒)。
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    runs = [elapsed / number for elapsed in timer.repeat(repeat=repeat, number=number)]
+    return statistics.median(runs), min(runs)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='CPU密集函数的微基准测试')
+    parser.add_argument('--filter', default='', help='只运行名称匹配该正则的用例')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    pattern = re.compile(args.filter)
+    started = time.perf_counter()
+    print(f"{'用例':<48}{'中位数(ms)':>12}{'最小值(ms)':>12}")
+    for name, func in benchmarks():
+        if not pattern.search(name):
+            continue
+        median, best = measure(func, args.repeat)
+        print(f"{name:<50}{median * 1000:>12.3f}{best * 1000:>12.3f}", flush=True)
+    print(f"总耗时 {time.perf_counter() - started:.1f}s")
+
+if __name__ == '__main__':
+    main()
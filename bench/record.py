@@ -0,0 +1,66 @@
+# record.py
+"""
+从真实的搜索引擎录制结果页和结果页面，保存到 fixtures 中替换现有样本：
+
+    python -m bench.record "python asyncio" --pages 5
+
+搜索引擎可能返回验证码页面，录制后请检查保存的HTML。
+"""
+import asyncio
+import argparse
+import urllib.parse
+from pathlib import Path
+
+import config
+from http_client import fetch, close_client
+from search_engines import parse_google_results, parse_bing_results, parse_baidu_results
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+
+ENGINES = {
+    'google': (lambda q: f"{config.GOOGLE_SEARCH_URL}?q={q}&num=10", parse_google_results),
+    'bing': (lambda q: f"{config.BING_SEARCH_URL}?q={q}&count=10", parse_bing_results),
+    'baidu': (lambda q: f"{config.BAIDU_SEARCH_URL}?wd={q}&rn=10&ie=utf-8", parse_baidu_results),
+}
+
+async def record(query, pages):
+    quoted = urllib.parse.quote_plus(query)
+    links = []
+    for name, (build_url, parse) in ENGINES.items():
+        try:
+            response = await fetch(build_url(quoted))
+            response.raise_for_status()
+        except Exception as e:
+            print(f"{name}: 请求失败 {e}")
+            continue
+        (FIXTURES / 'serp' / f'{name}.html').write_bytes(response.content)
+        results = parse(response.text, 10)
+        print(f"{name}: 已保存，解析出 {len(results)} 条结果")
+        links.extend(result['link'] for result in results if result['link'].startswith('http'))
+
+    saved = 0
+    for link in dict.fromkeys(links):
+        if saved >= pages:
+            break
+        try:
+            response = await fetch(link)
+            response.raise_for_status()
+        except Exception as e:
+            print(f"{link}: 请求失败 {e}")
+            continue
+        if 'html' not in response.headers.get('Content-Type', ''):
+            continue
+        saved += 1
+        (FIXTURES / 'pages' / f'recorded_{saved}.html').write_bytes(response.content)
+        print(f"{link}: 已保存为 recorded_{saved}.html ({len(response.content)} 字节)")
+    await close_client()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='录制搜索结果页和页面样本')
+    parser.add_argument('query')
+    parser.add_argument('--pages', type=int, default=5, help='保存的结果页面数')
+    args = parser.parse_args(argv)
+    asyncio.run(record(args.query, args.pages))
+
+if __name__ == '__main__':
+    main()
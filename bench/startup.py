@@ -0,0 +1,104 @@
+# startup.py
+"""
+测量冷启动耗时：在新进程中导入 main 的耗时和最慢的直接导入项，
+以及服务进程从启动到就绪、第一个和第二个 /search 请求的延迟，分别在关闭和开启 WARMUP 时测量：
+
+    python -m bench.startup
+    python -m bench.startup --runs 5 --app-env EXTRACT_WORKERS=2
+"""
+import re
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+import httpx
+
+from bench.load import ROOT, start_app, start_stub
+
+_IMPORTTIME_RE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+def import_seconds(runs):
+    """
+    在 runs 个新的解释器中导入 main，返回每次的耗时(秒)。
+    """
+    code = 'import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)'
+    return [
+        float(subprocess.run(
+            [sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.split()[-1])
+        for _ in range(runs)
+    ]
+
+def slowest_imports(top):
+    """
+    用 -X importtime 统计 main 的直接导入项，按累计耗时(毫秒)从高到低返回 [(模块, 耗时)]。
+    """
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stderr
+    entries = []
+    for line in output.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        # main 自身缩进为1，直接导入项缩进为3
+        if match and len(match.group(3)) == 3:
+            entries.append((match.group(4), int(match.group(2)) / 1000))
+    return sorted(entries, key=lambda entry: -entry[1])[:top]
+
+def measure_app(stub_env, app_env, processes):
+    """
+    启动一个服务进程，返回 (就绪耗时, 第一个请求耗时, 第二个请求耗时, 服务端记录的 startup 统计)。
+    两个请求使用不同的查询，都不命中缓存。
+    """
+    started = time.perf_counter()
+    app_url, app = start_app(stub_env, app_env, processes, interval=0.01)
+    ready = time.perf_counter() - started
+    latencies = []
+    try:
+        with httpx.Client(base_url=app_url, timeout=60) as client:
+            for query in ('cold start first', 'cold start second'):
+                request_started = time.perf_counter()
+                client.post('/search', json={'queries': [query], 'num_results': 5}).raise_for_status()
+                latencies.append(time.perf_counter() - request_started)
+            stats = client.get('/stats').json().get('startup', {})
+    finally:
+        app.terminate()
+        app.wait()
+        processes.remove(app)
+    return ready, latencies[0], latencies[1], stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='冷启动耗时测量')
+    parser.add_argument('--runs', type=int, default=3, help='每项测量重复的次数，报告中位数')
+    parser.add_argument('--top', type=int, default=10, help='列出累计耗时最长的直接导入项个数')
+    parser.add_argument('--app-env', action='append', default=[], metavar='KEY=VALUE',
+                        help='传给服务进程的环境变量，可重复指定')
+    args = parser.parse_args(argv)
+
+    seconds = import_seconds(args.runs)
+    print(f"导入 main: 中位数 {statistics.median(seconds) * 1000:.1f}ms  最小值 {min(seconds) * 1000:.1f}ms")
+    for module, elapsed in slowest_imports(args.top):
+        print(f"  {module:<32}{elapsed:>10.1f}ms")
+
+    # 桩服务器的延迟设为0，测得的差异只来自服务进程本身
+    stub_args = argparse.Namespace(stub_ports=4, serp_latency_ms=0, latency_ms=0, size_kb=0, error_rate=0.0)
+    processes = []
+    try:
+        stub_env = start_stub(stub_args, processes)
+        print(f"\n{'WARMUP':<8}{'就绪(ms)':>10}{'首个请求(ms)':>14}{'第二个请求(ms)':>16}  服务端统计(s)")
+        for warmup in ('false', 'true'):
+            runs = [
+                measure_app(stub_env, args.app_env + [f'WARMUP={warmup}'], processes)
+                for _ in range(args.runs)
+            ]
+            ready, first, second = (statistics.median(run[i] for run in runs) * 1000 for i in range(3))
+            print(f"{warmup:<8}{ready:>10.1f}{first:>14.1f}{second:>16.1f}  {runs[-1][3]}")
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+if __name__ == '__main__':
+    main()
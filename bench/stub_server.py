@@ -0,0 +1,154 @@
+# stub_server.py
+"""
+离线性能测试用的本地桩服务器：回放 fixtures 中录制的搜索结果页和页面，
+按配置的延迟、大小和错误率分布返回，替代真实的搜索引擎和目标站点。
+
+    python -m bench.stub_server --port 9000 --ports 8 --latency-ms 80
+
+搜索结果页在第一个端口上提供，结果链接分散到全部端口，
+使服务端的单主机并发、限流和熔断按不同站点生效。
+"""
+import re
+import socket
+import random
+import asyncio
+import hashlib
+import argparse
+from pathlib import Path
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+
+# 搜索引擎路径 -> (结果页文件, 查询参数名)
+SERP_ROUTES = {
+    '/google/search': ('google.html', 'q'),
+    '/bing/search': ('bing.html', 'q'),
+    '/baidu/s': ('baidu.html', 'wd'),
+}
+
+_HREF_RE = re.compile(r'href="https?://[^"]+"')
+
+def load_fixtures(directory):
+    return {path.stem: path.read_bytes() for path in sorted(directory.glob('*.html'))}
+
+class Distribution:
+    """
+    对数正态分布的采样器：median 为中位数，sigma 越大长尾越明显，sigma 为0时恒为中位数。
+    """
+    def __init__(self, median, sigma, rng):
+        self.median = median
+        self.sigma = sigma
+        self.rng = rng
+
+    def sample(self):
+        if self.median <= 0:
+            return 0
+        if self.sigma <= 0:
+            return self.median
+        return self.rng.lognormvariate(0, self.sigma) * self.median
+
+def create_app(args, ports):
+    rng = random.Random(args.seed)
+    serps = load_fixtures(FIXTURES / 'serp')
+    pages = load_fixtures(FIXTURES / 'pages')
+    page_names = sorted(pages)
+    serp_latency = Distribution(args.serp_latency_ms / 1000, args.latency_sigma, rng)
+    page_latency = Distribution(args.latency_ms / 1000, args.latency_sigma, rng)
+    page_size = Distribution(args.size_kb * 1024, args.size_sigma, rng)
+    padded = {}
+
+    def page_urls(query):
+        # 相同查询总是得到相同的链接，便于测试缓存命中
+        digest = hashlib.md5(query.encode('utf-8')).hexdigest()[:10]
+        for i in range(1000):
+            port = ports[(int(digest, 16) + i) % len(ports)]
+            name = page_names[(int(digest, 16) + i) % len(page_names)]
+            yield f'href="http://127.0.0.1:{port}/page/{name}/{digest}-{i}"'
+
+    def pad_page(name, target):
+        """
+        在页面末尾追加段落，使页面大小接近 target 字节；按4KB取整后缓存。
+        """
+        body = pages[name]
+        if target <= len(body):
+            return body
+        bucket = int(target) // 4096 * 4096 + 4096
+        if (name, bucket) not in padded:
+            paragraph = (
+                b'<p>Padding paragraph generated by the benchmark stub server to reach '
+                b'the configured page size distribution for offline testing.</p>'
+            )
+            extra = b'<div class="more">' + paragraph * ((bucket - len(body)) // len(paragraph) + 1) + b'</div>'
+            padded[(name, bucket)] = body.replace(b'</body>', extra + b'</body>', 1)
+        return padded[(name, bucket)]
+
+    app = FastAPI()
+
+    @app.get('/')
+    async def root():
+        return {'serp': sorted(serps), 'pages': page_names, 'ports': ports}
+
+    async def serp(request: Request):
+        filename, param = SERP_ROUTES[request.url.path]
+        await asyncio.sleep(serp_latency.sample())
+        urls = page_urls(request.query_params.get(param, ''))
+        text = serps[filename[:-5]].decode('utf-8', errors='replace')
+        text = _HREF_RE.sub(lambda match: next(urls), text)
+        return Response(text, media_type='text/html; charset=utf-8')
+
+    for path in SERP_ROUTES:
+        app.add_api_route(path, serp, methods=['GET'])
+
+    @app.get('/page/{name}/{key}')
+    async def page(name: str, key: str):
+        await asyncio.sleep(page_latency.sample())
+        if name not in pages:
+            return Response(status_code=404)
+        if rng.random() < args.error_rate:
+            return Response(status_code=500)
+        # 录制的页面编码不一，响应头中不声明编码，由服务端从 <meta> 或内容中识别
+        # media_type 会被 Starlette 自动补上 charset=utf-8，这里直接设置响应头
+        return Response(pad_page(name, page_size.sample()), headers={'Content-Type': 'text/html'})
+
+    return app
+
+def bind_sockets(port, count):
+    sockets = []
+    for i in range(count):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(('127.0.0.1', port + i if port else 0))
+        sock.listen(2048)
+        sockets.append(sock)
+    return sockets
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='离线性能测试用的搜索引擎和站点桩服务器')
+    parser.add_argument('--port', type=int, default=9000, help='第一个监听端口，0 表示随机端口')
+    parser.add_argument('--ports', type=int, default=8, help='监听的端口数，每个端口模拟一个站点')
+    parser.add_argument('--serp-latency-ms', type=float, default=200, help='搜索结果页延迟的中位数(毫秒)')
+    parser.add_argument('--latency-ms', type=float, default=80, help='页面延迟的中位数(毫秒)')
+    parser.add_argument('--latency-sigma', type=float, default=0.6, help='延迟对数正态分布的sigma')
+    parser.add_argument('--size-kb', type=float, default=0, help='页面大小的中位数(KB)，0 表示使用原始大小')
+    parser.add_argument('--size-sigma', type=float, default=0.8, help='页面大小对数正态分布的sigma')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='页面返回500的比例')
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    sockets = bind_sockets(args.port, max(1, args.ports))
+    ports = [sock.getsockname()[1] for sock in sockets]
+    base = f"http://127.0.0.1:{ports[0]}"
+    print(f"GOOGLE_SEARCH_URL={base}/google/search", flush=True)
+    print(f"BING_SEARCH_URL={base}/bing/search", flush=True)
+    print(f"BAIDU_SEARCH_URL={base}/baidu/s", flush=True)
+
+    server = uvicorn.Server(uvicorn.Config(create_app(args, ports), log_level='warning'))
+    server.run(sockets=sockets)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,353 @@
+# cache.py
+import sys
+import time
+import json
+import zlib
+import queue
+import asyncio
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+import config
+
+class SQLiteBackend:
+    """
+    基于SQLite的本地磁盘缓存后端，同一主机上的多个工作进程可共享同一个文件。
+    条目以压缩的JSON存储，写入时定期清理过期条目并限制文件内数据总大小。
+    读取在调用方线程中执行(由缓存层放到线程池)，写入、清理和清空都交给专用的写线程，
+    数据库被其他进程锁住时也不会阻塞事件循环。
+    """
+    SWEEP_INTERVAL = 200
+    # 写线程队列的长度上限，积压时丢弃新的写入
+    QUEUE_SIZE = 1000
+
+    def __init__(self, path, namespace, max_bytes):
+        self.path = path
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._read_conn = None
+        self._write_conn = None
+        self._read_lock = threading.Lock()
+        self._writes = 0
+        self._queue = queue.Queue(self.QUEUE_SIZE)
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, "
+            "size INTEGER NOT NULL, stored_at REAL NOT NULL, expires_at REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_stored_at ON cache (stored_at)")
+        conn.commit()
+        return conn
+
+    def get(self, key):
+        """
+        返回 (value, expires_at)，不存在或已过期时返回 None。会阻塞，不要在事件循环中直接调用。
+        """
+        try:
+            with self._read_lock:
+                if self._read_conn is None:
+                    self._read_conn = self._connect()
+                row = self._read_conn.execute(
+                    "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                    (self.namespace, key)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logging.warning(f"读取磁盘缓存失败: {e}")
+            return None
+
+        if row is None or row[1] <= time.time():
+            return None
+        return json.loads(zlib.decompress(row[0])), row[1]
+
+    def set(self, key, value, ttl):
+        """
+        提交给写线程后立即返回。
+        """
+        self._submit(self._write, key, value, time.time(), ttl)
+
+    def sweep(self):
+        self._submit(self._sweep)
+
+    def clear(self):
+        self._submit(self._clear)
+
+    def flush(self, timeout=None):
+        """
+        等待已提交的写入完成，返回是否在 timeout 秒内完成。
+        """
+        done = threading.Event()
+        self._submit(None, done)
+        return done.wait(timeout)
+
+    def _submit(self, func, *args):
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run_writer, name='sqlite-cache-writer', daemon=True)
+                self._writer.start()
+        try:
+            self._queue.put_nowait((func, args))
+        except queue.Full:
+            self.dropped += 1
+            logging.warning("磁盘缓存写入积压，丢弃本次写入")
+
+    def _run_writer(self):
+        while True:
+            func, args = self._queue.get()
+            if func is None:
+                args[0].set()
+                continue
+            try:
+                if self._write_conn is None:
+                    self._write_conn = self._connect()
+                func(*args)
+            except sqlite3.Error as e:
+                logging.warning(f"写入磁盘缓存失败: {e}")
+            except Exception as e:
+                logging.error(f"磁盘缓存写线程出错: {e}")
+
+    def _write(self, key, value, now, ttl):
+        blob = zlib.compress(
+            json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        )
+        conn = self._write_conn
+        conn.execute(
+            "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?)",
+            (self.namespace, key, blob, len(blob), now, now + ttl)
+        )
+        conn.commit()
+        self._writes += 1
+        if self._writes % self.SWEEP_INTERVAL == 0:
+            self._sweep()
+
+    def _sweep(self):
+        """
+        删除过期条目，并在总大小超限时从最旧的条目开始淘汰。
+        """
+        conn = self._write_conn
+        conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            cutoff = conn.execute(
+                "SELECT stored_at FROM (SELECT stored_at, SUM(size) OVER "
+                "(ORDER BY stored_at) AS running FROM cache) WHERE running >= ? LIMIT 1",
+                (excess,)
+            ).fetchone()
+            if cutoff is not None:
+                conn.execute("DELETE FROM cache WHERE stored_at <= ?", (cutoff[0],))
+        conn.commit()
+
+    def _clear(self):
+        conn = self._write_conn
+        conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+        conn.commit()
+
+def create_backend(namespace):
+    """
+    根据 CACHE_BACKEND 配置创建持久化缓存后端，memory 模式下返回 None。
+    """
+    if config.CACHE_BACKEND == 'sqlite':
+        return SQLiteBackend(config.CACHE_SQLITE_PATH, namespace, config.CACHE_SQLITE_MAX_BYTES)
+    return None
+
+class TTLCache:
+    """
+    带过期时间的LRU缓存，条目数超过上限时淘汰最久未使用的条目。
+    配置了持久化后端时，内存未命中会在线程池中回查后端，写入时提交给后端的写线程。
+    """
+    def __init__(self, maxsize, ttl, backend=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.backend_hits = 0
+        self._data = OrderedDict()
+
+    async def get(self, key):
+        item = self._data.get(key)
+        if item is not None and item[1] <= time.time():
+            del self._data[key]
+            item = None
+
+        if item is None and self.backend is not None:
+            item = await asyncio.to_thread(self.backend.get, key)
+            if item is not None:
+                self.backend_hits += 1
+                self._store(key, *item)
+
+        if item is None:
+            self.misses += 1
+            return None
+
+        if key in self._data:
+            self._data.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        self._store(key, value, time.time() + self.ttl)
+        if self.backend is not None:
+            self.backend.set(key, value, self.ttl)
+
+    def _store(self, key, value, expires_at):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+        if self.backend is not None:
+            self.backend.clear()
+
+    def flush(self, timeout=None):
+        """
+        等待后端完成已提交的写入。
+        """
+        if self.backend is not None:
+            self.backend.flush(timeout)
+
+    def stats(self):
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'backend_hits': self.backend_hits
+        }
+
+class ContentCache:
+    """
+    按URL缓存提取后的页面文本及ETag/Last-Modified，按总字节数做LRU淘汰。
+    超过软过期时间的条目需要通过条件请求重新验证后才能继续使用。
+    持久化后端中带校验头的条目最多保留 max_age 秒。
+    """
+    def __init__(self, max_bytes, soft_ttl, max_age=None, backend=None):
+        self.max_bytes = max_bytes
+        self.soft_ttl = soft_ttl
+        self.max_age = max_age or soft_ttl
+        self.backend = backend
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.backend_hits = 0
+        self._data = OrderedDict()
+
+    async def get(self, url):
+        """
+        返回缓存条目；已过期且无法做条件请求的条目视为未命中。
+        """
+        entry = self._data.get(url)
+        if entry is None and self.backend is not None:
+            item = await asyncio.to_thread(self.backend.get, url)
+            if item is not None:
+                entry = item[0]
+                self.backend_hits += 1
+                self._store(url, entry)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if not self.is_fresh(entry) and not (entry['etag'] or entry['last_modified']):
+            self._remove(url)
+            self.misses += 1
+            return None
+
+        if url in self._data:
+            self._data.move_to_end(url)
+        if self.is_fresh(entry):
+            self.hits += 1
+        return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry['stored_at'] < self.soft_ttl
+
+    def set(self, url, content, etag=None, last_modified=None):
+        entry = {
+            'content': content,
+            'etag': etag,
+            'last_modified': last_modified,
+            'stored_at': time.time()
+        }
+        self._store(url, entry)
+        self._persist(url, entry)
+
+    def touch(self, url):
+        """
+        条件请求返回304后刷新条目的存储时间。
+        """
+        entry = self._data.get(url)
+        if entry is not None:
+            entry['stored_at'] = time.time()
+            self._data.move_to_end(url)
+            self.revalidated += 1
+            self._persist(url, entry)
+
+    def _persist(self, url, entry):
+        if self.backend is None:
+            return
+        ttl = self.max_age if (entry['etag'] or entry['last_modified']) else self.soft_ttl
+        self.backend.set(url, {k: entry[k] for k in ('content', 'etag', 'last_modified', 'stored_at')}, ttl)
+
+    def _store(self, url, entry):
+        size = (
+            sys.getsizeof(entry['content']) + len(url)
+            + len(entry['etag'] or '') + len(entry['last_modified'] or '')
+        )
+        if size > self.max_bytes:
+            return
+        if url in self._data:
+            self._remove(url)
+
+        entry['size'] = size
+        self._data[url] = entry
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self.total_bytes -= evicted['size']
+
+    def _remove(self, url):
+        entry = self._data.pop(url, None)
+        if entry is not None:
+            self.total_bytes -= entry['size']
+
+    def clear(self):
+        self._data.clear()
+        self.total_bytes = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+    def flush(self, timeout=None):
+        if self.backend is not None:
+            self.backend.flush(timeout)
+
+    def stats(self):
+        return {
+            'size': len(self._data),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'soft_ttl': self.soft_ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidated': self.revalidated,
+            'backend_hits': self.backend_hits
+        }
@@ -0,0 +1,145 @@
+# compression.py
+import zlib
+import asyncio
+from starlette.datastructures import Headers, MutableHeaders
+
+from metrics import RESPONSE_BYTES
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 超过该大小的响应体在线程中压缩，避免阻塞事件循环
+THREAD_MIN_SIZE = 128 * 1024
+
+# 本身已压缩或需要逐条实时送达的类型不压缩
+EXCLUDED_TYPES = ('text/event-stream', 'application/gzip', 'application/zip', 'image/', 'audio/', 'video/')
+
+def parse_accept_encoding(value):
+    """
+    解析 Accept-Encoding 请求头，返回 {编码: q值}。
+    """
+    accepted = {}
+    for item in value.split(','):
+        name, _, params = item.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, number = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+def choose_encoding(value):
+    """
+    按客户端的 q 值选择压缩方式，相同时优先 br(需安装 brotli)，其次 gzip；都不接受时返回 None。
+    """
+    accepted = parse_accept_encoding(value)
+    candidates = ('br', 'gzip') if brotli is not None else ('gzip',)
+    best, best_quality = None, 0.0
+    for name in candidates:
+        quality = accepted.get(name, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+class Compressor:
+    """
+    gzip 或 br 的流式压缩器：非最后一块时做同步刷新，使流式响应的每个事件都能及时送达。
+    """
+    def __init__(self, encoding, gzip_level=6, brotli_quality=4):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data, final):
+        if self.encoding == 'br':
+            output = self._compressor.process(data)
+            return output + (self._compressor.finish() if final else self._compressor.flush())
+        output = self._compressor.compress(data)
+        return output + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    """
+    按 Accept-Encoding 协商压缩响应，支持普通响应和流式响应。
+    小于 minimum_size 字节的普通响应、已设置 Content-Encoding 的响应和 EXCLUDED_TYPES 中的类型原样返回。
+    """
+    def __init__(self, app, minimum_size=1024, gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get('accept-encoding', ''))
+        state = {'start': None, 'compressor': None, 'passthrough': encoding is None, 'encoding': 'identity'}
+
+        async def send_body(message):
+            RESPONSE_BYTES.inc(len(message.get('body', b'')), encoding=state['encoding'])
+            await send(message)
+
+        async def compress(body, final):
+            compressor = state['compressor']
+            if len(body) >= THREAD_MIN_SIZE:
+                return await asyncio.to_thread(compressor.compress, body, final)
+            return compressor.compress(body, final)
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                headers = Headers(raw=message['headers'])
+                media_type = headers.get('content-type', '').lower()
+                if 'content-encoding' in headers or media_type.startswith(EXCLUDED_TYPES):
+                    state['passthrough'] = True
+                if state['passthrough']:
+                    await send(message)
+                else:
+                    # 等到第一块响应体再决定是否压缩
+                    state['start'] = message
+                return
+
+            if message['type'] != 'http.response.body' or state['passthrough']:
+                if message['type'] == 'http.response.body':
+                    await send_body(message)
+                else:
+                    await send(message)
+                return
+
+            body = message.get('body', b'')
+            more_body = message.get('more_body', False)
+            start = state['start']
+            if start is not None:
+                state['start'] = None
+                headers = MutableHeaders(raw=start['headers'])
+                headers.add_vary_header('Accept-Encoding')
+                if not more_body and len(body) < self.minimum_size:
+                    state['passthrough'] = True
+                    await send(start)
+                    await send_body(message)
+                    return
+                state['compressor'] = Compressor(encoding, self.gzip_level, self.brotli_quality)
+                state['encoding'] = encoding
+                headers['Content-Encoding'] = encoding
+                body = await compress(body, not more_body)
+                if more_body:
+                    del headers['Content-Length']
+                else:
+                    headers['Content-Length'] = str(len(body))
+                await send(start)
+            else:
+                body = await compress(body, not more_body)
+            await send_body({'type': 'http.response.body', 'body': body, 'more_body': more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,107 @@
+# config.py
+import os
+import tempfile
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 服务端口
+PORT = int(os.getenv("PORT", 8000))
+
+# HTTP连接池配置
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 10))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 200))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 50))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 60))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", 20))
+
+# 单个请求内并发执行的查询数上限
+QUERY_CONCURRENCY = int(os.getenv("QUERY_CONCURRENCY", 5))
+
+# 搜索结果页缓存
+SERP_CACHE_SIZE = int(os.getenv("SERP_CACHE_SIZE", 1024))
+SERP_CACHE_TTL = float(os.getenv("SERP_CACHE_TTL", 600))
+
+# 页面内容缓存
+CONTENT_CACHE_MAX_BYTES = int(os.getenv("CONTENT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+CONTENT_CACHE_TTL = float(os.getenv("CONTENT_CACHE_TTL", 3600))
+
+# 缓存后端：memory 仅使用进程内缓存；sqlite 额外使用本地磁盘缓存，多个工作进程共享
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_SQLITE_PATH = os.getenv(
+    "CACHE_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "search_cache.sqlite3")
+)
+CACHE_SQLITE_MAX_BYTES = int(os.getenv("CACHE_SQLITE_MAX_BYTES", 256 * 1024 * 1024))
+# 带ETag/Last-Modified的页面内容在磁盘缓存中的最长保留时间
+CONTENT_CACHE_MAX_AGE = float(os.getenv("CONTENT_CACHE_MAX_AGE", 7 * 24 * 3600))
+
+# HTML解析器后端：auto(默认，优先lxml)、lxml 或 html.parser
+HTML_PARSER = os.getenv("HTML_PARSER", "auto").lower()
+
+# 页面下载上限：声明大小超过 CONTENT_MAX_BYTES 的页面不下载，正文最多读取 CONTENT_READ_BYTES 字节
+CONTENT_MAX_BYTES = int(os.getenv("CONTENT_MAX_BYTES", 10 * 1024 * 1024))
+CONTENT_READ_BYTES = int(os.getenv("CONTENT_READ_BYTES", 2 * 1024 * 1024))
+
+# 正文提取进程数：0 表示在线程中提取；多核机器上可设为CPU核数以绕开GIL
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", 0))
+
+# 限流：每个搜索引擎/内容站点每秒的请求数和突发上限，拿不到令牌最多等待 RATE_LIMIT_MAX_WAIT 秒
+ENGINE_RATE_LIMIT = float(os.getenv("ENGINE_RATE_LIMIT", 5))
+ENGINE_RATE_BURST = int(os.getenv("ENGINE_RATE_BURST", 10))
+HOST_RATE_LIMIT = float(os.getenv("HOST_RATE_LIMIT", 5))
+HOST_RATE_BURST = int(os.getenv("HOST_RATE_BURST", 10))
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", 2))
+
+# 熔断：BREAKER_WINDOW 秒内失败 BREAKER_FAILURES 次后断开，BREAKER_RECOVERY 秒后半开探测，
+# 探测失败时恢复时间加倍，最长 BREAKER_MAX_RECOVERY 秒
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", 5))
+BREAKER_WINDOW = float(os.getenv("BREAKER_WINDOW", 30))
+BREAKER_RECOVERY = float(os.getenv("BREAKER_RECOVERY", 30))
+BREAKER_MAX_RECOVERY = float(os.getenv("BREAKER_MAX_RECOVERY", 600))
+
+# 所选搜索引擎熔断或被拦截时是否改用其他可用的搜索引擎
+ENGINE_FALLBACK = os.getenv("ENGINE_FALLBACK", "true").lower() in ("1", "true", "yes")
+
+# 对冲请求：内容请求超过历史耗时的 HEDGE_PERCENTILE 百分位(不低于 HEDGE_MIN_DELAY 秒)仍未完成时，
+# 再发一次相同请求并取先完成的结果；对冲请求数不超过内容请求数的 HEDGE_MAX_RATIO
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", 95))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", 0.5))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", 20))
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", 0.1))
+
+# 默认多取的候选结果数，请求中的 overfetch 参数优先
+OVERFETCH = int(os.getenv("OVERFETCH", 0))
+
+# 请求开启 profile 时采样分析器的采样间隔(秒)
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", 0.005))
+
+# 各搜索引擎的结果页地址，可改为代理或本地测试服务器
+GOOGLE_SEARCH_URL = os.getenv("GOOGLE_SEARCH_URL", "https://www.google.com/search")
+BING_SEARCH_URL = os.getenv("BING_SEARCH_URL", "https://www.bing.com/search")
+BAIDU_SEARCH_URL = os.getenv("BAIDU_SEARCH_URL", "https://www.baidu.com/s")
+
+# 按相关性筛选段落：是否默认开启、段落长度，以及每个结果和每个请求的字符预算
+PASSAGE_SELECTION = os.getenv("PASSAGE_SELECTION", "false").lower() in ("1", "true", "yes")
+PASSAGE_MAX_CHARS = int(os.getenv("PASSAGE_MAX_CHARS", 400))
+RESULT_CHAR_BUDGET = int(os.getenv("RESULT_CHAR_BUDGET", 2000))
+REQUEST_CHAR_BUDGET = int(os.getenv("REQUEST_CHAR_BUDGET", 12000))
+
+# 正文提取器：density 为单次遍历的文本密度提取器，legacy 为原来的多次选择器提取
+EXTRACTOR = os.getenv("EXTRACTOR", "density").lower()
+
+# 每条结果 content 的默认字符上限，0 表示不截断
+MAX_CONTENT_CHARS = int(os.getenv("MAX_CONTENT_CHARS", 0))
+
+# 响应压缩：按 Accept-Encoding 协商 br(需安装 brotli)或 gzip，小于 COMPRESS_MIN_SIZE 字节的响应不压缩
+RESPONSE_COMPRESSION = os.getenv("RESPONSE_COMPRESSION", "true").lower() in ("1", "true", "yes")
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))
+
+# 启动预热：导入解析依赖并走一遍查询处理和正文提取，提前与 WARMUP_URLS(逗号分隔)中的站点建立连接，
+# EXTRACT_WORKERS 大于0时同时启动正文提取进程；每个预热连接最多等待 WARMUP_TIMEOUT 秒
+WARMUP = os.getenv("WARMUP", "false").lower() in ("1", "true", "yes")
+WARMUP_URLS = [url.strip() for url in os.getenv("WARMUP_URLS", GOOGLE_SEARCH_URL).split(",") if url.strip()]
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", 3))
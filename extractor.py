@@ -0,0 +1,185 @@
+# extractor.py
+import re
+
+# 整个子树都不参与提取的标签
+SKIP_TAGS = frozenset({
+    'head', 'title', 'script', 'style', 'meta', 'link', 'noscript', 'iframe', 'template', 'svg',
+    'header', 'footer', 'nav', 'aside', 'form', 'button', 'select', 'textarea'
+})
+
+# 块级标签：文本节点归属到最近的块级祖先
+BLOCK_TAGS = frozenset({
+    'body', 'article', 'main', 'section', 'div', 'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'li', 'ul', 'ol', 'dl', 'dd', 'dt', 'table', 'tr', 'td', 'th', 'pre', 'blockquote', 'figcaption'
+})
+HEADING_TAGS = frozenset({'h1', 'h2', 'h3', 'h4', 'h5', 'h6'})
+
+# class 中包含这些片段的元素视为干扰内容，与旧提取器一致
+_NOISE_CLASS_RE = re.compile(r'menu|sidebar|banner|advertisement|copyright|social')
+# class/id 中表示正文或非正文的词，用于调整候选容器的分数
+_POSITIVE_RE = re.compile(r'article|content|main|post|entry|text|body|story', re.I)
+_NEGATIVE_RE = re.compile(r'comment|meta|footer|footnote|related|share|recommend|hidden|tag|widget', re.I)
+_BRACKETED_RE = re.compile(r'^[【\[\(（].*[】\]\)）]$')
+_COMMA_RE = re.compile(r'[,，、]')
+
+NOISE_WORDS = ('copyright', '版权所有', '关注我们', '扫描二维码')
+
+# 段落计入候选容器分数的最小长度，以及输出的最小长度
+MIN_SCORE_CHARS = 25
+MIN_BLOCK_CHARS = 20
+MIN_HEADING_CHARS = 10
+# 输出过短时向上扩大容器的次数和阈值
+MIN_CONTENT_CHARS = 200
+MAX_WIDEN = 3
+
+class Block:
+    """
+    一个块级元素：直属文本、子树文本和链接文本的字符数，以及在先序遍历中的位置区间 [start, end)。
+    """
+    __slots__ = (
+        'tag', 'name', 'parent', 'start', 'end', 'pieces', 'link_chars',
+        'subtree_chars', 'subtree_link_chars', 'score', 'text'
+    )
+
+    def __init__(self, tag, parent, start):
+        self.tag = tag
+        self.name = tag.name
+        self.parent = parent
+        self.start = start
+        self.end = start
+        self.pieces = []
+        self.link_chars = 0
+        self.subtree_chars = 0
+        self.subtree_link_chars = 0
+        self.score = 0.0
+        self.text = ''
+
+def collect_blocks(root):
+    """
+    对文档树做一次迭代式先序遍历，跳过干扰元素，把每个文本节点归入最近的块级祖先。
+    子树字符数在元素出栈时累加到父块，每个节点只访问一次，耗时与文档大小成线性关系。
+    返回按文档顺序排列的块列表。
+    """
+    # 调用时文档树已经由 bs4 构建，这里导入不会带来额外开销
+    from bs4 import NavigableString, Tag
+
+    body = root.body or root
+    top = Block(body, None, 0)
+    blocks = [top]
+    index = 1
+    # 栈中元素：(节点, 当前所属块, 是否在链接内)；None 表示一个块的结束标记
+    stack = [(child, top, False) for child in reversed(body.contents)]
+
+    while stack:
+        node, block, in_link = stack.pop()
+        if node is None:
+            finished = block
+            finished.end = index + 1
+            finished.text = ' '.join(''.join(finished.pieces).split())
+            finished.subtree_chars += len(finished.text)
+            finished.subtree_link_chars += finished.link_chars
+            if finished.parent is not None:
+                finished.parent.subtree_chars += finished.subtree_chars
+                finished.parent.subtree_link_chars += finished.subtree_link_chars
+            continue
+
+        index += 1
+        if isinstance(node, Tag):
+            if node.name in SKIP_TAGS:
+                continue
+            classes = node.get('class')
+            if classes and _NOISE_CLASS_RE.search(' '.join(classes)):
+                continue
+
+            if node.name in BLOCK_TAGS:
+                block = Block(node, block, index)
+                blocks.append(block)
+                stack.append((None, block, in_link))
+            stack.extend((child, block, in_link or node.name == 'a') for child in reversed(node.contents))
+        elif type(node) is NavigableString:
+            block.pieces.append(node)
+            if in_link:
+                block.link_chars += len(node.strip())
+
+    # body 本身最后结束
+    top.end = index + 1
+    top.text = ' '.join(''.join(top.pieces).split())
+    top.subtree_chars += len(top.text)
+    top.subtree_link_chars += top.link_chars
+    return blocks
+
+def class_weight(tag):
+    attributes = ' '.join(tag.get('class') or ()) + ' ' + (tag.get('id') or '')
+    if tag.get('role') == 'main':
+        attributes += ' main'
+    weight = 0
+    if _POSITIVE_RE.search(attributes):
+        weight += 25
+    if _NEGATIVE_RE.search(attributes):
+        weight -= 25
+    if tag.name in ('article', 'main'):
+        weight += 30
+    return weight
+
+def score_blocks(blocks):
+    """
+    按文本密度给候选容器打分：每个足够长的块按长度和逗号数得分，
+    分数累加给父块，一半累加给祖父块；容器最终分数再按链接密度打折并加上 class/id 权重。
+    返回分数最高的容器。
+    """
+    for block in blocks:
+        length = len(block.text)
+        if length < MIN_SCORE_CHARS or block.name in HEADING_TAGS:
+            continue
+        score = 1 + len(_COMMA_RE.findall(block.text)) + min(length // 100, 3)
+        if block.parent is not None:
+            block.parent.score += score
+            if block.parent.parent is not None:
+                block.parent.parent.score += score / 2
+
+    best = blocks[0]
+    best_score = None
+    for block in blocks:
+        if block.score <= 0:
+            continue
+        link_density = block.subtree_link_chars / block.subtree_chars if block.subtree_chars else 0
+        block.score = block.score * (1 - link_density) + class_weight(block.tag)
+        if best_score is None or block.score > best_score:
+            best, best_score = block, block.score
+    return best
+
+def is_content_block(block):
+    text = block.text
+    if block.name in HEADING_TAGS:
+        if len(text) <= MIN_HEADING_CHARS:
+            return False
+    elif len(text) < MIN_BLOCK_CHARS:
+        return False
+    if block.link_chars > len(text) / 2:
+        return False
+    lowered = text.lower()
+    if any(word in lowered for word in NOISE_WORDS):
+        return False
+    return not _BRACKETED_RE.match(text)
+
+def blocks_within(blocks, container):
+    parts = []
+    for block in blocks:
+        if container.start <= block.start < container.end and is_content_block(block):
+            parts.append(f"- {block.text}" if block.name == 'li' else block.text)
+    return parts
+
+def extract_main_content(soup):
+    """
+    单次遍历的正文提取：选出文本密度最高的容器，按文档顺序返回其中的有效文本块。
+    内容过短时逐级扩大到上层容器。
+    """
+    blocks = collect_blocks(soup)
+    container = score_blocks(blocks)
+    parts = blocks_within(blocks, container)
+    for _ in range(MAX_WIDEN):
+        if sum(len(part) for part in parts) >= MIN_CONTENT_CHARS or container.parent is None:
+            break
+        container = container.parent
+        parts = blocks_within(blocks, container)
+    return parts
@@ -0,0 +1,133 @@
+# http_client.py
+import time
+import asyncio
+import contextlib
+import contextvars
+import urllib.parse
+import httpx
+import config
+from metrics import UPSTREAM_INFLIGHT, current_trace
+from resilience import KeyedRegistry
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/113.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
+}
+
+_client = None
+# 每个主机的并发信号量，按LRU淘汰，避免访问过的主机越来越多时无限增长
+_host_semaphores = KeyedRegistry(lambda: asyncio.Semaphore(config.HTTP_MAX_CONNECTIONS_PER_HOST))
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """
+    当前请求已超过截止时间，未发出上游请求。
+    """
+
+# 当前请求的截止时间（事件循环时间），由接口层设置并随任务上下文向下传递
+request_deadline = contextvars.ContextVar('request_deadline', default=None)
+
+def get_client():
+    """
+    获取进程内共享的异步HTTP客户端，首次调用时创建。
+    连接池大小和长连接保持时间由环境变量配置。
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            headers=DEFAULT_HEADERS,
+            timeout=config.HTTP_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=config.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY
+            )
+        )
+    return _client
+
+def host_semaphore(url):
+    """
+    返回目标主机对应的信号量，用于限制单个主机的并发连接数。
+    """
+    return _host_semaphores.get(urllib.parse.urlsplit(url).netloc.lower())
+
+def request_timeout():
+    """
+    计算本次上游请求可用的超时时间，不超过当前请求剩余的时间。
+    """
+    deadline = request_deadline.get()
+    if deadline is None:
+        return config.HTTP_TIMEOUT
+
+    remaining = deadline - asyncio.get_running_loop().time()
+    if remaining <= 0:
+        raise DeadlineExceeded("已超过请求截止时间")
+    return min(config.HTTP_TIMEOUT, remaining)
+
+def trace_extensions():
+    """
+    开启耗时明细时返回 httpx 的 trace 扩展，记录连接(含DNS解析)、TLS握手、
+    首字节(TTFB)和下载耗时；复用长连接时没有连接和握手耗时。
+    """
+    trace = current_trace.get()
+    if trace is None:
+        return {}
+
+    names = {'connect_tcp': 'connect', 'start_tls': 'tls', 'receive_response_body': 'download'}
+    started = {}
+
+    def add(name, seconds):
+        trace[name] = round(trace.get(name, 0) + seconds, 4)
+
+    async def on_event(event, info):
+        step, _, phase = event.rpartition('.')
+        step = step.split('.', 1)[-1]
+        now = time.perf_counter()
+        if phase == 'started':
+            started[step] = now
+            # 提前结束读取正文时不会有 receive_response_body.complete 事件
+            if step == 'response_closed' and 'receive_response_body' in started:
+                add('download', now - started.pop('receive_response_body'))
+        elif phase == 'complete':
+            if step == 'receive_response_headers' and 'send_request_headers' in started:
+                add('ttfb', now - started.pop('send_request_headers'))
+            elif step in names and step in started:
+                add(names[step], now - started.pop(step))
+
+    return {'trace': on_event}
+
+async def fetch(url, **kwargs):
+    """
+    通过共享连接池发送GET请求，遵守单主机并发上限和请求截止时间。
+    """
+    async with host_semaphore(url):
+        with UPSTREAM_INFLIGHT.track_inprogress():
+            return await get_client().get(
+                url, timeout=request_timeout(), extensions=trace_extensions(), **kwargs
+            )
+
+@contextlib.asynccontextmanager
+async def stream(url, **kwargs):
+    """
+    以流式方式发送GET请求，调用方可以先检查响应头再决定是否读取正文。
+    """
+    async with host_semaphore(url):
+        with UPSTREAM_INFLIGHT.track_inprogress():
+            async with get_client().stream(
+                'GET', url, timeout=request_timeout(), extensions=trace_extensions(), **kwargs
+            ) as response:
+                yield response
+
+async def close_client():
+    """
+    关闭共享的HTTP客户端，释放连接。
+    """
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _host_semaphores.clear()
@@ -1,22 +1,65 @@
 # main.py
-from fastapi import FastAPI, HTTPException
+import time
+# 从这里开始计算模块导入耗时，冷启动时这部分时间计入第一个请求
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Union
 import logging
-import os
-from dotenv import load_dotenv
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import json
+from contextlib import asynccontextmanager
 
+import config
+from compression import CompressionMiddleware
+from http_client import DeadlineExceeded, close_client, request_deadline
+from metrics import INFLIGHT_REQUESTS, TIMEOUTS, current_trace, render_metrics
+from profiler import SamplingProfiler
+from relevance import select_passages
+from responses import encode_response, project_result
+from startup import STARTUP_STATS, record_first_request, warm_up
 from search_engines import (
-    get_google_search_results,
-    get_bing_search_results,
-    get_baidu_search_results
+    get_search_function,
+    fill_page_contents,
+    fill_first_valid,
+    select_results,
+    serp_cache,
+    serp_flight,
+    engine_breakers
+)
+from utils import (
+    content_cache,
+    content_flight,
+    host_breakers,
+    hedge_delay,
+    ENCODING_STATS,
+    HEDGE_STATS,
+    shutdown_extract_executor
 )
 
-# 加载环境变量
-load_dotenv()
+# 设置搜索超时时间为55秒(留5秒缓冲)
+SEARCH_TIMEOUT = 55
+
+def result_options(request):
+    """
+    返回 (保留的结果字段集合, content 字符上限, 是否需要获取页面内容)。
+    未指定 fields 时保留全部字段；fields 中没有 content 时不获取页面内容。
+    """
+    fields = set(request.fields) if request.fields is not None else None
+    # 与其他数值参数一样截到合法范围：0 及负数表示不截断
+    max_content_chars = max(0, config.MAX_CONTENT_CHARS if request.max_content_chars is None else request.max_content_chars)
+    return fields, max_content_chars, fields is None or 'content' in fields
+
+def deadline_seconds(request):
+    """
+    返回请求可用的总时间(秒)，未指定或超过 SEARCH_TIMEOUT 时取 SEARCH_TIMEOUT。
+    """
+    if request.deadline and request.deadline > 0:
+        return min(request.deadline, SEARCH_TIMEOUT)
+    return SEARCH_TIMEOUT
 
 # 配置日志
 logging.basicConfig(
@@ -24,10 +67,23 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if config.WARMUP:
+        await warm_up()
+    yield
+    # 等待磁盘缓存写完已提交的条目
+    for cache in (serp_cache, content_cache):
+        await asyncio.to_thread(cache.flush, 5)
+    # 关闭共享的HTTP连接池和正文提取进程池
+    await close_client()
+    shutdown_extract_executor()
+
 app = FastAPI(
     title="OnlineGPT Search API",
     description="A web API for searching information from multiple search engines",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 配置CORS
@@ -39,11 +95,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 按 Accept-Encoding 压缩响应
+if config.RESPONSE_COMPRESSION:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=config.COMPRESS_MIN_SIZE,
+        gzip_level=config.GZIP_LEVEL,
+        brotli_quality=config.BROTLI_QUALITY
+    )
+
 class SearchRequest(BaseModel):
     queries: List[str]
     num_results: Optional[int] = 5
-    engine: Optional[str] = "Google"
+    engine: Optional[Union[str, List[str]]] = "Google"
     custom_question: Optional[str] = None
+    max_concurrency: Optional[int] = None
+    no_cache: Optional[bool] = False
+    deadline: Optional[float] = None
+    overfetch: Optional[int] = None
+    debug_timings: Optional[bool] = False
+    profile: Optional[bool] = False
+    select_passages: Optional[bool] = None
+    result_char_budget: Optional[int] = None
+    request_char_budget: Optional[int] = None
+    fields: Optional[List[str]] = None
+    max_content_chars: Optional[int] = None
 
 class SearchResult(BaseModel):
     title: str
@@ -55,60 +131,257 @@ class SearchResult(BaseModel):
 async def root():
     return {"message": "Welcome to OnlineGPT Search API"}
 
+@app.get("/stats")
+async def stats():
+    return {
+        "serp_cache": serp_cache.stats(),
+        "content_cache": content_cache.stats(),
+        "serp_singleflight": serp_flight.stats(),
+        "content_singleflight": content_flight.stats(),
+        "encoding": ENCODING_STATS,
+        "hedging": dict(HEDGE_STATS, delay=hedge_delay()),
+        "startup": STARTUP_STATS,
+        "engines": {name: breaker.stats() for name, breaker in engine_breakers.items()},
+        "open_hosts": {
+            host: breaker.stats() for host, breaker in host_breakers.items()
+            if breaker.state != breaker.CLOSED
+        }
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """
+    以 Prometheus 文本格式输出本进程的指标。
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.post("/search")
-async def search(request: SearchRequest):
+async def search(request: SearchRequest, http_request: Request):
+    INFLIGHT_REQUESTS.inc(endpoint='search')
+    request_started = time.perf_counter()
+    # 只对本次请求开启采样分析
+    profiler = SamplingProfiler(config.PROFILE_INTERVAL).start() if request.profile else None
     try:
-        # 设置搜索超时时间为55秒(留5秒缓冲)
-        timeout = 55
-        
-        async def search_with_timeout():
-            all_results = []
-            for query in request.queries:
-                if request.engine == 'Google':
-                    results = await asyncio.get_event_loop().run_in_executor(
-                        None, 
-                        get_google_search_results,
-                        query, 
-                        request.num_results
-                    )
-                elif request.engine == 'Bing':
-                    results = await asyncio.get_event_loop().run_in_executor(
-                        None,
-                        get_bing_search_results,
-                        query,
-                        request.num_results
-                    )
-                elif request.engine == '百度':
-                    results = await asyncio.get_event_loop().run_in_executor(
-                        None,
-                        get_baidu_search_results,
-                        query,
-                        request.num_results
-                    )
+        # 同一请求内的查询并发执行，并发数受限于 max_concurrency
+        concurrency = max(1, request.max_concurrency or config.QUERY_CONCURRENCY)
+        semaphore = asyncio.Semaphore(concurrency)
+        use_cache = not request.no_cache
+
+        search_func = get_search_function(request.engine)
+        if search_func is None:
+            raise HTTPException(status_code=400, detail="Unsupported search engine")
+
+        # 截止时间随任务上下文传递给每个搜索结果页和页面内容请求
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + deadline_seconds(request)
+        request_deadline.set(deadline)
+
+        # 多取 overfetch 个候选结果，凑满 num_results 个有效内容后取消其余请求
+        overfetch = max(0, config.OVERFETCH if request.overfetch is None else request.overfetch)
+        fields, max_content_chars, fetch_content = result_options(request)
+        if not fetch_content:
+            overfetch = 0
+
+        states = [
+            {'query': query, 'results': None, 'content_started': None, 'timings': {}}
+            for query in request.queries
+        ]
+
+        async def search_query(state):
+            if request.debug_timings:
+                # 耗时明细随任务上下文传递，搜索结果页和各结果分别记录
+                current_trace.set(state['timings'])
+            async with semaphore:
+                serp_started = loop.time()
+                results = await search_func(
+                    state['query'], request.num_results + overfetch, use_cache, fetch_content=False
+                )
+                state['timings']['serp'] = round(loop.time() - serp_started, 4)
+                state['results'] = results
+                state['content_started'] = loop.time()
+                if not fetch_content:
+                    return
+                if overfetch:
+                    state['results'] = await fill_first_valid(results, request.num_results, use_cache)
                 else:
-                    raise HTTPException(status_code=400, detail="Unsupported search engine")
-                
-                all_results.extend(results)
-            return all_results
+                    await fill_page_contents(results, use_cache)
+
+        tasks = [asyncio.create_task(search_query(state)) for state in states]
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=deadline - loop.time())
+        finally:
+            for task in tasks:
+                task.cancel()
 
-        # 使用asyncio.wait_for来设置超时
-        results = await asyncio.wait_for(search_with_timeout(), timeout=timeout)
+        # 搜索请求本身出错时仍然整体返回错误；在等待共享调用时到达截止时间的查询按未完成处理
+        timed_out = bool(pending)
+        for task in tasks:
+            if task in done and task.exception() is not None:
+                if isinstance(task.exception(), DeadlineExceeded):
+                    timed_out = True
+                    continue
+                raise task.exception()
 
-        return {
-            "status": "success",
+        # 到达截止时间后返回已完成的部分，未完成的条目标记为 timeout
+        now = loop.time()
+        all_results = []
+        entries = []
+        pending_queries = []
+        for state in states:
+            if state['results'] is None:
+                pending_queries.append({
+                    "query": state['query'],
+                    "status": "timeout",
+                    "elapsed": round(now - started, 3)
+                })
+                continue
+
+            for result in select_results(state['results'], request.num_results):
+                result = dict(result)
+                if fetch_content and result.get('status', 'pending') == 'pending':
+                    result['status'] = 'timeout'
+                    result['elapsed'] = round(now - state['content_started'], 3)
+                all_results.append(result)
+                entries.append((state['query'], result))
+
+        if timed_out:
+            TIMEOUTS.inc(stage='request')
+            logging.error("Search timeout, returning partial results")
+
+        # 按与查询和自定义问题的相关性筛选段落，压缩返回的内容
+        if config.PASSAGE_SELECTION if request.select_passages is None else request.select_passages:
+            await asyncio.to_thread(
+                select_passages, entries, request.custom_question, config.PASSAGE_MAX_CHARS,
+                request.result_char_budget or config.RESULT_CHAR_BUDGET,
+                request.request_char_budget or config.REQUEST_CHAR_BUDGET
+            )
+
+        # 按请求裁剪字段和截断内容，减少序列化和传输的数据量
+        if fields is not None or max_content_chars:
+            all_results = [project_result(result, fields, max_content_chars) for result in all_results]
+
+        # 结果按查询顺序分组，顺序稳定
+        response = {
+            "status": "partial" if timed_out else "success",
             "query": request.queries,
             "engine": request.engine,
             "custom_question": request.custom_question,
-            "results": results
+            "results": all_results,
+            "elapsed": round(now - started, 3)
         }
-    except asyncio.TimeoutError:
-        logging.error("Search timeout")
-        raise HTTPException(status_code=504, detail="Search timeout")
+        if pending_queries:
+            response["pending_queries"] = pending_queries
+        if request.debug_timings:
+            response["timings"] = [dict(state['timings'], query=state['query']) for state in states]
+        if profiler is not None:
+            profiler.stop()
+            response["profile"] = profiler.summary()
+        return encode_response(response, http_request.headers.get("accept"))
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Search error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        INFLIGHT_REQUESTS.dec(endpoint='search')
+        record_first_request(time.perf_counter() - request_started)
+        if profiler is not None:
+            profiler.stop()
+
+@app.post("/search/stream")
+async def search_stream(request: SearchRequest):
+    """
+    以NDJSON流式返回搜索结果：每个查询的搜索结果页信息先行返回，
+    各结果的页面内容在获取完成后逐条返回。
+    """
+    search_func = get_search_function(request.engine)
+    if search_func is None:
+        raise HTTPException(status_code=400, detail="Unsupported search engine")
+
+    concurrency = max(1, request.max_concurrency or config.QUERY_CONCURRENCY)
+    semaphore = asyncio.Semaphore(concurrency)
+    use_cache = not request.no_cache
+    fields, max_content_chars, fetch_content = result_options(request)
+    queue = asyncio.Queue()
+
+    async def stream_content(query_index, index, result):
+        await fill_page_contents([result], use_cache)
+        await queue.put({
+            "type": "content",
+            "query_index": query_index,
+            "index": index,
+            "content": project_result(result, None, max_content_chars)['content'],
+            "status": result['status'],
+            "elapsed": result['elapsed']
+        })
+
+    async def stream_query(query_index, query):
+        async with semaphore:
+            try:
+                results = await search_func(
+                    query, request.num_results, use_cache, fetch_content=False
+                )
+            except Exception as e:
+                logging.error(f"Search error: {str(e)}")
+                await queue.put({
+                    "type": "error",
+                    "query_index": query_index,
+                    "query": query,
+                    "detail": str(e)
+                })
+                return
+
+            for index, result in enumerate(results):
+                await queue.put({
+                    "type": "result",
+                    "query_index": query_index,
+                    "query": query,
+                    "index": index,
+                    **project_result({k: v for k, v in result.items() if k != 'content'}, fields)
+                })
+
+            if not fetch_content:
+                return
+            await asyncio.gather(
+                *(stream_content(query_index, index, result) for index, result in enumerate(results))
+            )
+
+    async def run_all():
+        await asyncio.gather(
+            *(stream_query(query_index, query) for query_index, query in enumerate(request.queries))
+        )
+        await queue.put(None)
+
+    async def event_stream():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + deadline_seconds(request)
+        request_deadline.set(deadline)
+        task = asyncio.create_task(run_all())
+        INFLIGHT_REQUESTS.inc(endpoint='search_stream')
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=deadline - loop.time())
+                except asyncio.TimeoutError:
+                    TIMEOUTS.inc(stage='request')
+                    logging.error("Search timeout")
+                    yield json.dumps({"type": "timeout"}) + "\n"
+                    break
+                if event is None:
+                    yield json.dumps({"type": "done"}) + "\n"
+                    break
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        finally:
+            # 客户端断开或超时时取消尚未完成的请求
+            task.cancel()
+            INFLIGHT_REQUESTS.dec(endpoint='search_stream')
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+STARTUP_STATS['import'] = round(time.perf_counter() - _IMPORT_STARTED, 4)
+logging.info(f"模块导入耗时 {STARTUP_STATS['import']:.3f}s")
 
 if __name__ == "__main__":
     import uvicorn
-    port = int(os.getenv("PORT", 8000))
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
\ No newline at end of file
+    uvicorn.run("main:app", host="0.0.0.0", port=config.PORT, reload=True)
\ No newline at end of file
@@ -0,0 +1,202 @@
+# metrics.py
+import time
+import bisect
+import contextlib
+import contextvars
+
+# 默认的耗时分桶(秒)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 当前页面内容请求所属的搜索引擎，用作内容阶段指标的 engine 标签
+current_engine = contextvars.ContextVar('current_engine', default='')
+
+# 当前查询或结果的耗时明细，请求开启 debug_timings 时为dict，否则为None
+current_trace = contextvars.ContextVar('current_trace', default=None)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """
+    指标基类：按标签值分别记录样本，输出 Prometheus 文本格式。
+    """
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple((name, labels.get(name, '')) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for key in sorted(self._values):
+            lines.extend(self._render_sample(key, self._values[key]))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}"]
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextlib.contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        sample = self._values.get(key)
+        if sample is None:
+            # [各分桶计数..., +Inf 计数, 总和]
+            sample = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        sample[bisect.bisect_left(self.buckets, value)] += 1
+        sample[-1] += value
+
+    def _render_sample(self, key, sample):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), sample[:-1]):
+            cumulative += count
+            lines.append(
+                f"{self.name}_bucket{_format_labels(key, [('le', _format_value(float(bound)))])} {cumulative}"
+            )
+        lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(sample[-1])}")
+        lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+# 各处理阶段的耗时：serp_fetch、serp_decode、serp_parse、content_fetch、content_decode、content_extract
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'search_stage_duration_seconds', '各处理阶段的耗时(秒)', ('stage', 'engine')
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    'search_cache_requests_total', '缓存查询次数，result 为 hit、miss 或 stale', ('cache', 'result')
+))
+TIMEOUTS = REGISTRY.register(Counter(
+    'search_timeouts_total', '超时次数，stage 为 serp、content 或 request', ('stage',)
+))
+UPSTREAM_RESPONSES = REGISTRY.register(Counter(
+    'search_upstream_responses_total', '上游响应次数，按目标和状态码统计', ('target', 'status')
+))
+DOWNLOADED_BYTES = REGISTRY.register(Counter(
+    'search_downloaded_bytes_total', '从上游下载的正文字节数', ('target',)
+))
+INFLIGHT_REQUESTS = REGISTRY.register(Gauge(
+    'search_inflight_requests', '正在处理的接口请求数', ('endpoint',)
+))
+UPSTREAM_INFLIGHT = REGISTRY.register(Gauge(
+    'search_upstream_inflight_requests', '正在进行的上游HTTP请求数'
+))
+RESPONSE_BYTES = REGISTRY.register(Counter(
+    'search_response_bytes_total', '返回给客户端的响应字节数，encoding 为 identity、gzip 或 br', ('encoding',)
+))
+
+def trace_set(name, value):
+    """
+    向当前耗时明细写入一项，未开启时忽略。
+    """
+    trace = current_trace.get()
+    if trace is not None:
+        trace[name] = value
+
+def trace_add(name, seconds):
+    """
+    在当前耗时明细中累加一项耗时(秒)，未开启时忽略。
+    """
+    trace = current_trace.get()
+    if trace is not None:
+        trace[name] = round(trace.get(name, 0) + seconds, 4)
+
+@contextlib.contextmanager
+def trace_scope(name):
+    """
+    在当前耗时明细下创建名为 name 的子明细，代码块内的记录写入子明细。
+    """
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    token = current_trace.set(trace.setdefault(name, {}))
+    try:
+        yield
+    finally:
+        current_trace.reset(token)
+
+def observe_stage(stage, engine, seconds):
+    """
+    记录一个阶段的耗时：写入阶段直方图，开启耗时明细时同时写入明细。
+    """
+    STAGE_SECONDS.observe(seconds, stage=stage, engine=engine)
+    trace_add(stage, seconds)
+
+@contextlib.contextmanager
+def timed_stage(stage, engine=''):
+    """
+    统计代码块的耗时，代码块抛出异常时同样记录。
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, engine, time.perf_counter() - started)
+
+def render_metrics():
+    """
+    以 Prometheus 文本格式输出当前进程的所有指标。
+    """
+    return REGISTRY.render()
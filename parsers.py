@@ -0,0 +1,27 @@
+# parsers.py
+import logging
+import config
+
+def resolve_parser(name):
+    """
+    确定HTML解析器后端：未配置时优先使用C实现的lxml，不可用时回退到纯Python的html.parser。
+    """
+    if name in (None, '', 'auto', 'lxml'):
+        try:
+            import lxml  # noqa: F401
+            return 'lxml'
+        except ImportError:
+            if name == 'lxml':
+                logging.warning("未安装lxml，回退到html.parser解析器")
+            return 'html.parser'
+    return name
+
+HTML_PARSER = resolve_parser(config.HTML_PARSER)
+
+def make_soup(text, parser=None):
+    """
+    使用配置的解析器后端构建BeautifulSoup文档树。
+    bs4 在第一次解析时才导入，不计入服务的启动时间。
+    """
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(text, parser or HTML_PARSER)
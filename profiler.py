@@ -0,0 +1,84 @@
+# profiler.py
+import os
+import sys
+import time
+import threading
+from collections import Counter
+
+# 事件循环空闲等待时所在的函数，采样到这些栈顶时计为空闲
+IDLE_FUNCTIONS = {'select', 'poll', 'epoll', 'kqueue', 'control'}
+
+class SamplingProfiler:
+    """
+    采样分析器：后台线程每隔 interval 秒采样一次目标线程(默认为当前线程，即事件循环线程)的调用栈，
+    统计各函数自身(栈顶)和累计(出现在栈中)的采样次数。
+    事件循环同时处理其他请求，采样结果反映的是这段时间内整个事件循环线程的开销。
+    """
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.samples = 0
+        self.idle = 0
+        self.self_counts = Counter()
+        self.total_counts = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+        self._elapsed = 0.0
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._elapsed = time.perf_counter() - self._started
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            if frame.f_code.co_name in IDLE_FUNCTIONS:
+                self.idle += 1
+                continue
+
+            self.self_counts[self._label(frame)] += 1
+            seen = set()
+            while frame is not None:
+                label = self._label(frame)
+                if label not in seen:
+                    seen.add(label)
+                    self.total_counts[label] += 1
+                frame = frame.f_back
+
+    @staticmethod
+    def _label(frame):
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def summary(self, top=15):
+        """
+        返回采样结果摘要：采样次数、空闲比例，以及自身和累计采样次数最多的函数。
+        """
+        def rank(counts):
+            return [
+                {'function': label, 'samples': count, 'ratio': round(count / self.samples, 3)}
+                for label, count in counts.most_common(top)
+            ]
+
+        return {
+            'interval': self.interval,
+            'elapsed': round(self._elapsed, 3),
+            'samples': self.samples,
+            'idle_ratio': round(self.idle / self.samples, 3) if self.samples else None,
+            'self': rank(self.self_counts),
+            'cumulative': rank(self.total_counts)
+        }
@@ -0,0 +1,161 @@
+# relevance.py
+import re
+import math
+from collections import Counter, defaultdict
+
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 中日韩文字：连续的文字切分为二元组(bigram)，单个字作为一元组
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+_TOKEN_RE = re.compile(rf'[{_CJK}]+|[a-z0-9]+(?:[\'.][a-z0-9]+)*')
+_CJK_RE = re.compile(rf'[{_CJK}]')
+
+# 按句子切分：中文句末标点，或英文句末标点后跟空白
+_SENTENCE_RE = re.compile(r'(?<=[。！？；!?;])|(?<=[.!?])\s+')
+
+# 查询中的高级搜索语法(site:、filetype: 等)和排除词不参与打分
+_OPERATOR_RE = re.compile(r'\b\w+:\S+|(?:^|\s)-\S+')
+
+STOPWORDS = frozenset(
+    'a an and are as at be but by for from how in into is it of on or that the this to was what '
+    'when where which who why will with'.split()
+)
+
+def tokenize(text):
+    """
+    切分词项：英文和数字按单词切分并转为小写，中日韩文字按二元组切分。
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if _CJK_RE.match(token):
+            if len(token) == 1:
+                tokens.append(token)
+            else:
+                tokens.extend(token[i:i + 2] for i in range(len(token) - 1))
+        elif token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+def query_terms(query, question=None):
+    """
+    从查询和自定义问题中提取打分用的词项，去除高级搜索语法。
+    """
+    text = _OPERATOR_RE.sub(' ', query or '')
+    if question:
+        text += ' ' + question
+    return set(tokenize(text.replace('"', ' ')))
+
+def split_passages(text, max_chars):
+    """
+    将正文按句子切分，并把相邻句子合并成不超过 max_chars 个字符的段落。
+    超长的句子按 max_chars 截断成多段。
+    """
+    passages = []
+    current = ''
+    for sentence in _SENTENCE_RE.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        while len(sentence) > max_chars:
+            if current:
+                passages.append(current)
+                current = ''
+            passages.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            passages.append(current)
+            current = ''
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        passages.append(current)
+    return passages
+
+def bm25_scores(passage_tokens, queries):
+    """
+    在同一语料(本次请求的全部段落)上批量计算BM25分数。
+    passage_tokens 为各段落的词项列表，queries 为各段落对应查询的词项集合；
+    通过倒排索引只计算包含查询词的段落，返回与段落一一对应的分数列表。
+    """
+    count = len(passage_tokens)
+    scores = [0.0] * count
+    if not count:
+        return scores
+
+    lengths = [len(tokens) for tokens in passage_tokens]
+    average = sum(lengths) / count or 1
+    postings = defaultdict(list)
+    for index, tokens in enumerate(passage_tokens):
+        for term, tf in Counter(tokens).items():
+            postings[term].append((index, tf))
+
+    for term in set().union(*queries):
+        posting = postings.get(term)
+        if not posting:
+            continue
+        idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+        for index, tf in posting:
+            if term in queries[index]:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[index] / average)
+                scores[index] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+    return scores
+
+def select_passages(entries, question, passage_chars, result_budget, request_budget):
+    """
+    按相关性压缩结果内容。entries 为 (查询, 结果) 列表，只处理 status 为 ok 的结果。
+    所有结果的段落放在一起打分，先给每个结果选取其分数最高的段落，再按分数从高到低填充剩余预算，
+    每个结果不超过 result_budget 个字符，整个请求不超过 request_budget 个字符；没有匹配词项的段落按原文顺序排在最后。
+    段落长度不超过 result_budget，第一轮的段落超出剩余的请求预算时截短；
+    选中的段落按原文顺序拼接后写回 content，请求预算已用完而一个段落都没有选到的结果 content 为空，status 改为 over_budget。
+    """
+    # 段落不能比单个结果的预算还长，否则预算较小时所有段落都放不下
+    passage_chars = max(1, min(passage_chars, result_budget))
+    passages = []
+    for query, result in entries:
+        if result.get('status') != 'ok':
+            continue
+        terms = query_terms(query, question)
+        for position, passage in enumerate(split_passages(result['content'], passage_chars)):
+            passages.append((result, position, passage, terms))
+
+    scores = bm25_scores(
+        [tokenize(passage) for _, _, passage, _ in passages],
+        [terms for _, _, _, terms in passages]
+    )
+    order = sorted(range(len(passages)), key=lambda i: (-scores[i], passages[i][1]))
+
+    # 第一轮只取每个结果的最佳段落，避免排名靠前的结果用完整个请求的预算
+    best = {}
+    for i in order:
+        best.setdefault(id(passages[i][0]), i)
+    first_round = [i for i in order if best[id(passages[i][0])] == i]
+
+    used = Counter()
+    total = 0
+    chosen = defaultdict(list)
+    picked = set()
+    for round_index, i in enumerate(first_round + order):
+        if i in picked:
+            continue
+        picked.add(i)
+        result, position, passage, _ = passages[i]
+        if round_index < len(first_round):
+            # 最佳段落超出剩余的请求预算时截短，而不是整个结果都没有内容
+            passage = passage[:max(0, min(result_budget - used[id(result)], request_budget - total))]
+            if not passage:
+                continue
+        size = len(passage)
+        if used[id(result)] + size > result_budget or total + size > request_budget:
+            continue
+        used[id(result)] += size
+        total += size
+        chosen[id(result)].append((position, passage))
+
+    for query, result in entries:
+        if result.get('status') != 'ok':
+            continue
+        selected = sorted(chosen.get(id(result), ()))
+        if id(result) in best and not selected:
+            result['status'] = 'over_budget'
+        result['content'] = ' '.join(passage for _, passage in selected)
@@ -0,0 +1,199 @@
+# resilience.py
+import time
+import asyncio
+from collections import OrderedDict, deque
+
+class EngineUnavailable(Exception):
+    """
+    上游暂时不可用（熔断、限流或被拦截），调用方可以快速失败或改用其他搜索引擎。
+    """
+
+class TokenBucket:
+    """
+    令牌桶限流器：以 rate 个/秒的速度补充令牌，最多积累 burst 个。
+    """
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.rejected = 0
+        self._updated = time.monotonic()
+
+    async def acquire(self, max_wait):
+        """
+        获取一个令牌，需要等待的时间超过 max_wait 秒时返回 False。
+        """
+        if self.rate <= 0:
+            return True
+
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+
+        wait = (1 - self.tokens) / self.rate
+        if wait > max_wait:
+            self.rejected += 1
+            return False
+
+        # 预留令牌后等待，排在后面的调用会相应等待更久
+        self.tokens -= 1
+        await asyncio.sleep(wait)
+        return True
+
+class CircuitBreaker:
+    """
+    熔断器：window 秒内失败 failure_threshold 次后断开，断开期间直接拒绝请求；
+    恢复时间到后进入半开状态放行一个探测请求，探测成功则闭合，
+    失败则再次断开并将恢复时间加倍（不超过 max_recovery_timeout）。
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, window, recovery_timeout, max_recovery_timeout):
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.base_recovery_timeout = recovery_timeout
+        self.max_recovery_timeout = max_recovery_timeout
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.opened_until = 0.0
+        self.probe_started = None
+        self.failures = deque()
+        self.rejected = 0
+        self.trips = 0
+
+    def is_available(self):
+        """
+        是否可能放行请求（不占用半开状态的探测名额）。
+        """
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            return now >= self.opened_until
+        if self.state == self.HALF_OPEN:
+            return self.probe_started is None or now - self.probe_started > self.recovery_timeout
+        return True
+
+    def allow(self):
+        now = time.monotonic()
+        if self.state == self.OPEN and now >= self.opened_until:
+            self.state = self.HALF_OPEN
+            self.probe_started = None
+
+        if self.state == self.HALF_OPEN:
+            # 只放行一个探测请求；探测长时间没有结果时允许重新探测
+            if self.probe_started is None or now - self.probe_started > self.recovery_timeout:
+                self.probe_started = now
+                return True
+            self.rejected += 1
+            return False
+
+        if self.state == self.OPEN:
+            self.rejected += 1
+            return False
+        return True
+
+    def probe(self):
+        """
+        返回当前半开探测的标识(开始时间)，不处于半开状态时返回 None。在 allow() 之后调用。
+        """
+        return self.probe_started if self.state == self.HALF_OPEN else None
+
+    def release_probe(self, probe):
+        """
+        探测请求没有得出站点是否可用的结论(如请求截止时间已到或被取消)时释放探测名额，允许立即重新探测。
+        """
+        if probe is not None and self.state == self.HALF_OPEN and self.probe_started == probe:
+            self.probe_started = None
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            self.state = self.CLOSED
+            self.recovery_timeout = self.base_recovery_timeout
+            self.probe_started = None
+        self.failures.clear()
+
+    def record_failure(self, retry_after=None):
+        now = time.monotonic()
+        if self.state == self.HALF_OPEN:
+            # 探测失败，指数退避
+            self.recovery_timeout = min(self.recovery_timeout * 2, self.max_recovery_timeout)
+            self._open(now, retry_after)
+            return
+
+        self.failures.append(now)
+        while self.failures and now - self.failures[0] > self.window:
+            self.failures.popleft()
+        if len(self.failures) >= self.failure_threshold or retry_after:
+            self._open(now, retry_after)
+
+    def _open(self, now, retry_after=None):
+        self.state = self.OPEN
+        self.opened_until = now + max(self.recovery_timeout, retry_after or 0)
+        self.probe_started = None
+        self.failures.clear()
+        self.trips += 1
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'retry_in': round(max(0.0, self.opened_until - time.monotonic()), 1) if self.state == self.OPEN else 0,
+            'trips': self.trips,
+            'rejected': self.rejected
+        }
+
+class KeyedRegistry:
+    """
+    按键（搜索引擎名或主机名）懒创建限流器/熔断器，最多保留 maxsize 个，按LRU淘汰。
+    """
+    def __init__(self, factory, maxsize=10000):
+        self.factory = factory
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+
+    def get(self, key):
+        item = self._items.get(key)
+        if item is None:
+            item = self._items[key] = self.factory()
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        else:
+            self._items.move_to_end(key)
+        return item
+
+    def items(self):
+        return self._items.items()
+
+    def clear(self):
+        self._items.clear()
+
+def parse_retry_after(value):
+    """
+    解析 Retry-After 响应头（秒数形式），无法解析时返回 None。
+    """
+    if value and value.strip().isdigit():
+        return float(value.strip())
+    return None
+
+class LatencyTracker:
+    """
+    记录最近 size 次请求的耗时，用于计算延迟百分位。
+    """
+    def __init__(self, size=1000):
+        self.samples = deque(maxlen=size)
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, p, min_samples=1):
+        """
+        返回第 p 百分位的耗时，样本数不足 min_samples 时返回 None。
+        """
+        if len(self.samples) < max(1, min_samples):
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * p / 100))
+        return ordered[index]
@@ -0,0 +1,38 @@
+# responses.py
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_TYPES = ('application/msgpack', 'application/x-msgpack')
+
+def project_result(result, fields=None, max_content_chars=None):
+    """
+    按请求的字段列表裁剪单个结果(保持原有字段顺序)，content 超过 max_content_chars 个字符时截断。
+    fields 为 None 时保留全部字段，max_content_chars 为空、0或负数时不截断。
+    """
+    if fields is not None:
+        result = {key: value for key, value in result.items() if key in fields}
+    content = result.get('content')
+    if max_content_chars and max_content_chars > 0 and content and len(content) > max_content_chars:
+        result = dict(result, content=content[:max_content_chars])
+    return result
+
+def wants_msgpack(accept):
+    """
+    Accept 请求头中声明了 msgpack 且已安装 msgpack 时返回 True。
+    """
+    if msgpack is None or not accept:
+        return False
+    return any(item.split(';')[0].strip().lower() in MSGPACK_TYPES for item in accept.split(','))
+
+def encode_response(data, accept=None):
+    """
+    按 Accept 请求头序列化响应：内部调用方请求 msgpack 时返回二进制格式，否则返回JSON。
+    直接返回 Response 对象，跳过 FastAPI 对返回值的逐层转换。
+    """
+    if wants_msgpack(accept):
+        return Response(msgpack.packb(data, use_bin_type=True), media_type=MSGPACK_TYPES[0])
+    return JSONResponse(data)
@@ -1,59 +1,70 @@
 # search_engines.py
+import asyncio
+import time
+import functools
 import logging
 import urllib.parse
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import requests
-from bs4 import BeautifulSoup
-from utils import get_page_content
-import charset_normalizer
+import httpx
+import config
+from cache import TTLCache, create_backend
+from http_client import fetch, DeadlineExceeded
+from metrics import (
+    CACHE_REQUESTS, DOWNLOADED_BYTES, TIMEOUTS, UPSTREAM_RESPONSES,
+    current_engine, current_trace, timed_stage, trace_scope, trace_set
+)
+from parsers import make_soup
+from resilience import (
+    CircuitBreaker, EngineUnavailable, KeyedRegistry, TokenBucket, parse_retry_after
+)
+from singleflight import SingleFlight
+from utils import get_page_content, decode_content, FAILED_CONTENTS
 import re
 
+# 解析后的搜索结果页缓存（不含页面内容）
+serp_cache = TTLCache(
+    config.SERP_CACHE_SIZE, config.SERP_CACHE_TTL, create_backend('serp')
+)
+
+# 合并相同的并发搜索请求
+serp_flight = SingleFlight()
+
+# 每个搜索引擎的限流器和熔断器
+engine_limiters = KeyedRegistry(
+    lambda: TokenBucket(config.ENGINE_RATE_LIMIT, config.ENGINE_RATE_BURST)
+)
+engine_breakers = KeyedRegistry(
+    lambda: CircuitBreaker(
+        config.BREAKER_FAILURES, config.BREAKER_WINDOW,
+        config.BREAKER_RECOVERY, config.BREAKER_MAX_RECOVERY
+    )
+)
+
+# 识别验证码/拦截页面的特征：(最终URL中的片段, HTML中的片段)
+BLOCKED_PAGE_MARKERS = {
+    'Google': (('/sorry/',), ('id="captcha-form"', 'action="/sorry/')),
+    'Bing': (('/challenge', 'captcha'), ('id="b_captcha"', 'class="captcha"')),
+    '百度': (('wappass.baidu.com', '/captcha'), ('<title>百度安全验证</title>',))
+}
+
+# 高级搜索语法：结果字段 -> 预编译的正则，按顺序提取
+_QUERY_PATTERNS = (
+    ('exact_phrases', re.compile(r'"([^"]+)"')),        # 精确匹配的短语（使用双引号）
+    ('exclude_terms', re.compile(r'-(\w+)')),           # 排除关键词（使用减号）
+    ('site_search', re.compile(r'site:(\S+)')),         # 站内搜索（site:）
+    ('filetype', re.compile(r'filetype:(\w+)')),        # 文件类型搜索（filetype:）
+    ('ranges', re.compile(r'(\d+)\.\.(\d+)')),          # 数值范围搜索（使用..）
+    ('define_terms', re.compile(r'define:(\w+)')),      # 定义查询（define:）
+    ('related_sites', re.compile(r'related:(\S+)')),    # 相关搜索（related:）
+    ('title_terms', re.compile(r'intitle:(\S+)')),      # 标题搜索（intitle:）
+    ('url_terms', re.compile(r'inurl:(\S+)')),          # URL搜索（inurl:）
+    ('time_limits', re.compile(r'time:(last\d+\w+)'))   # 时间限制
+)
+
 def process_search_query(query):
     """
     处理搜索查询，识别并应用高级搜索技巧。
     """
-    # 提取精确匹配的短语（使用双引号）
-    exact_phrases = re.findall(r'"([^"]+)"', query)
-    
-    # 提取排除关键词（使用减号）
-    exclude_terms = re.findall(r'-(\w+)', query)
-    
-    # 提取站内搜索（site:）
-    site_search = re.findall(r'site:(\S+)', query)
-    
-    # 提取文件类型搜索（filetype:）
-    filetype = re.findall(r'filetype:(\w+)', query)
-    
-    # 提取数值范围搜索（使用..）
-    ranges = re.findall(r'(\d+)\.\.(\d+)', query)
-    
-    # 提取定义查询（define:）
-    define_terms = re.findall(r'define:(\w+)', query)
-    
-    # 提取相关搜索（related:）
-    related_sites = re.findall(r'related:(\S+)', query)
-    
-    # 提取标题搜索（intitle:）
-    title_terms = re.findall(r'intitle:(\S+)', query)
-    
-    # 提取URL搜索（inurl:）
-    url_terms = re.findall(r'inurl:(\S+)', query)
-    
-    # 提取时间限制
-    time_limits = re.findall(r'time:(last\d+\w+)', query)
-    
-    return {
-        'exact_phrases': exact_phrases,
-        'exclude_terms': exclude_terms,
-        'site_search': site_search,
-        'filetype': filetype,
-        'ranges': ranges,
-        'define_terms': define_terms,
-        'related_sites': related_sites,
-        'title_terms': title_terms,
-        'url_terms': url_terms,
-        'time_limits': time_limits
-    }
+    return {name: pattern.findall(query) for name, pattern in _QUERY_PATTERNS}
 
 def build_advanced_query(query, engine='Google'):
     """
@@ -97,42 +108,167 @@ def build_advanced_query(query, engine='Google'):
 
     return advanced_query
 
-def get_google_search_results(query, num_results=5):
+def is_blocked_page(engine, url, text):
     """
-    获取Google搜索结果，支持高级搜索语法。
+    判断搜索引擎是否返回了验证码或拦截页面。
     """
-    # 处理高级搜索查询
-    advanced_query = build_advanced_query(query, 'Google')
-    query_encoded = urllib.parse.quote_plus(advanced_query)
-    
-    # 如果是天气查询,优先搜索360天气网
-    if "天气" in query:
-        query_encoded = urllib.parse.quote_plus(f"site:tianqi.so.com {query}")
-    
-    url = f"https://www.google.com/search?q={query_encoded}&num={num_results}"
-
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/113.0.0.0 Safari/537.36"
-        ),
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
-    }
+    url_markers, html_markers = BLOCKED_PAGE_MARKERS.get(engine, ((), ()))
+    url = url.lower()
+    return any(marker in url for marker in url_markers) or any(marker in text for marker in html_markers)
 
-    logging.info(f"发送请求到Google URL: {url}")
+async def fetch_serp(url, engine):
+    """
+    请求搜索引擎结果页并返回解码后的HTML文本。
+    熔断或限流时快速失败；429/503 和验证码页面计为失败。
+    """
+    breaker = engine_breakers.get(engine)
+    if not breaker.is_available():
+        raise EngineUnavailable(f"{engine}搜索暂时不可用(熔断中)")
+    if not await engine_limiters.get(engine).acquire(config.RATE_LIMIT_MAX_WAIT):
+        raise EngineUnavailable(f"{engine}搜索请求过于频繁(限流)")
+    if not breaker.allow():
+        raise EngineUnavailable(f"{engine}搜索暂时不可用(熔断中)")
+    probe = breaker.probe()
+
+    logging.info(f"发送请求到{engine} URL: {url}")
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        with timed_stage('serp_fetch', engine):
+            response = await fetch(url)
+        UPSTREAM_RESPONSES.inc(target='serp', status=response.status_code)
+        DOWNLOADED_BYTES.inc(len(response.content), target='serp')
+        if response.status_code in (429, 503):
+            breaker.record_failure(parse_retry_after(response.headers.get('Retry-After')))
+            raise EngineUnavailable(f"{engine}返回{response.status_code}，请求被限制")
         response.raise_for_status()
 
-        detected = charset_normalizer.from_bytes(response.content).best()
-        encoding = detected.encoding if detected and detected.encoding else 'utf-8'
-        text = response.content.decode(encoding, errors='replace')
+        with timed_stage('serp_decode', engine):
+            text = await asyncio.to_thread(
+                decode_content, response.content, response.headers.get('Content-Type')
+            )
+        if is_blocked_page(engine, str(response.url), text):
+            breaker.record_failure()
+            raise EngineUnavailable(f"{engine}返回验证码或拦截页面")
+        breaker.record_success()
+        return text
+    except EngineUnavailable as e:
+        logging.error(f"{engine}搜索请求失败: {e}")
+        raise
     except Exception as e:
-        logging.error(f"Google搜索请求失败: {e}")
-        raise Exception(f"Google搜索请求失败: {e}")
+        if isinstance(e, httpx.TimeoutException):
+            TIMEOUTS.inc(stage='serp')
+        # 请求截止时间已到不是搜索引擎的问题，不计入熔断
+        if not isinstance(e, DeadlineExceeded):
+            breaker.record_failure()
+        logging.error(f"{engine}搜索请求失败: {e}")
+        raise Exception(f"{engine}搜索请求失败: {e}")
+    finally:
+        # 没有得出结论的探测(截止时间已到、共享调用被取消)不能让搜索引擎一直停在半开状态
+        breaker.release_probe(probe)
+
+def serp_cache_key(engine, search_query, num_results):
+    """
+    构建搜索结果缓存键：规范化空白和大小写后的查询、搜索引擎与结果数量。
+    """
+    normalized = ' '.join(search_query.lower().split())
+    return f"{engine}|{num_results}|{normalized}"
+
+async def get_serp_results(engine, search_query, url, parse, num_results, use_cache=True):
+    """
+    获取并解析搜索结果页，优先使用缓存，相同的并发请求只访问一次搜索引擎。
+    """
+    key = serp_cache_key(engine, search_query, num_results)
+    # 开启耗时明细时按搜索引擎分别记录
+    with trace_scope(engine):
+        if use_cache:
+            cached = await serp_cache.get(key)
+            CACHE_REQUESTS.inc(cache='serp', result='miss' if cached is None else 'hit')
+            trace_set('cache', 'miss' if cached is None else 'hit')
+            if cached is not None:
+                logging.info(f"{engine}搜索结果命中缓存: {search_query}")
+                return [dict(result) for result in cached]
+
+        results = await serp_flight.do(key, load_serp_results, key, engine, url, parse, num_results)
+    # 每个调用方各自拿一份副本，后续填充页面内容时互不影响
+    return [dict(result) for result in results]
+
+async def load_serp_results(key, engine, url, parse, num_results):
+    """
+    请求并解析搜索结果页，写入缓存。
+    """
+    text = await fetch_serp(url, engine)
+    with timed_stage('serp_parse', engine):
+        results = await asyncio.to_thread(parse, text, num_results)
+
+    # 空结果通常意味着被拦截或页面结构变化，不缓存
+    if results:
+        serp_cache.set(key, [dict(result) for result in results])
+    return results
+
+async def fill_page_contents(results, use_cache=True):
+    """
+    并发获取所有搜索结果的页面内容，原地写入 content、status 和 elapsed 字段。
+    status 取值：pending(获取中)、ok、error、timeout。
+    """
+    async def fill(result):
+        started = time.perf_counter()
+        result['status'] = 'pending'
+        current_engine.set(result.get('engine', ''))
+        # 开启耗时明细时，每个结果记录各自的明细
+        if current_trace.get() is not None:
+            result['timings'] = {}
+            current_trace.set(result['timings'])
+        try:
+            result['content'] = await get_page_content(result['link'], use_cache)
+        except Exception as e:
+            logging.error(f"获取页面内容失败 ({result['link']}): {e}")
+            result['content'] = "无法获取内容"
+
+        if result['content'] == "网页请求超时":
+            result['status'] = 'timeout'
+        elif result['content'] in FAILED_CONTENTS:
+            result['status'] = 'error'
+        else:
+            result['status'] = 'ok'
+        result['elapsed'] = round(time.perf_counter() - started, 3)
+
+    await asyncio.gather(*(fill(result) for result in results))
 
-    soup = BeautifulSoup(text, 'html.parser')
+def select_results(results, num_results):
+    """
+    从候选结果中选出 num_results 个：优先取内容获取成功的，不足时按排名用其余结果补齐。
+    返回的结果保持原有排名顺序。
+    """
+    ok = [i for i, result in enumerate(results) if result.get('status') == 'ok']
+    rest = [i for i, result in enumerate(results) if result.get('status') != 'ok']
+    chosen = sorted((ok + rest)[:num_results])
+    return [results[i] for i in chosen]
+
+async def fill_first_valid(results, num_results, use_cache=True):
+    """
+    并发获取所有候选结果的页面内容，已有 num_results 个成功时取消其余请求，
+    返回 select_results 选出的结果。
+    """
+    tasks = {
+        asyncio.ensure_future(fill_page_contents([result], use_cache)): result
+        for result in results
+    }
+    pending = set(tasks)
+    succeeded = 0
+    try:
+        while pending and succeeded < num_results:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            succeeded += sum(1 for task in done if tasks[task]['status'] == 'ok')
+    finally:
+        for task in pending:
+            task.cancel()
+
+    return select_results(results, num_results)
+
+def parse_google_results(text, num_results):
+    """
+    解析Google搜索结果页。
+    """
+    soup = make_soup(text)
     results = []
 
     for g in soup.find_all('div', class_='tF2Cxc'):
@@ -168,62 +304,13 @@ def get_google_search_results(query, num_results=5):
         if len(results) >= num_results:
             break
 
-    # 如果是天气查询,只返回360天气网的结果
-    if "天气" in query:
-        results = [r for r in results if 'tianqi.so.com' in r['link']]
-        if results:
-            results = [results[0]]  # 只保留第一个结果
-
-    # 并行获取页面内容
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_result = {
-            executor.submit(get_page_content, result['link']): result 
-            for result in results
-        }
-
-        for future in as_completed(future_to_result):
-            result = future_to_result[future]
-            try:
-                content = future.result()
-                result['content'] = content
-            except Exception as e:
-                logging.error(f"获取页面内容失败 ({result['link']}): {e}")
-                result['content'] = "无法获取内容"
-
     return results
 
-def get_bing_search_results(query, num_results=5):
+def parse_bing_results(text, num_results):
     """
-    获取Bing搜索结果，支持高级搜索语法。
+    解析Bing搜索结果页。
     """
-    # 处理高级搜索查询
-    advanced_query = build_advanced_query(query, 'Bing')
-    query_encoded = urllib.parse.quote_plus(advanced_query)
-    
-    url = f"https://www.bing.com/search?q={query_encoded}&count={num_results}"
-
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/113.0.0.0 Safari/537.36"
-        ),
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
-    }
-
-    logging.info(f"发送请求到Bing URL: {url}")
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-
-        detected = charset_normalizer.from_bytes(response.content).best()
-        encoding = detected.encoding if detected and detected.encoding else 'utf-8'
-        text = response.content.decode(encoding, errors='replace')
-    except Exception as e:
-        logging.error(f"Bing搜索请求失败: {e}")
-        raise Exception(f"Bing搜索请求失败: {e}")
-
-    soup = BeautifulSoup(text, 'html.parser')
+    soup = make_soup(text)
     results = []
 
     for li in soup.find_all('li', class_='b_algo'):
@@ -249,56 +336,13 @@ def get_bing_search_results(query, num_results=5):
         if len(results) >= num_results:
             break
 
-    # 并行获取页面内容
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_result = {
-            executor.submit(get_page_content, result['link']): result 
-            for result in results
-        }
-
-        for future in as_completed(future_to_result):
-            result = future_to_result[future]
-            try:
-                content = future.result()
-                result['content'] = content
-            except Exception as e:
-                logging.error(f"获取页面内容失败 ({result['link']}): {e}")
-                result['content'] = "无法获取内容"
-
     return results
 
-def get_baidu_search_results(query, num_results=5):
+def parse_baidu_results(text, num_results):
     """
-    获取百度搜索结果，支持高级搜索语法。
+    解析百度搜索结果页。
     """
-    # 处理高级搜索查询
-    advanced_query = build_advanced_query(query, '百度')
-    query_encoded = urllib.parse.quote_plus(advanced_query)
-    
-    url = f"https://www.baidu.com/s?wd={query_encoded}&rn={num_results}&ie=utf-8"
-
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/113.0.0.0 Safari/537.36"
-        ),
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
-    }
-
-    logging.info(f"发送请求到百度 URL: {url}")
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-
-        detected = charset_normalizer.from_bytes(response.content).best()
-        encoding = detected.encoding if detected and detected.encoding else 'utf-8'
-        text = response.content.decode(encoding, errors='replace')
-    except Exception as e:
-        logging.error(f"百度搜索请求失败: {e}")
-        raise Exception(f"百度搜索请求失败: {e}")
-
-    soup = BeautifulSoup(text, 'html.parser')
+    soup = make_soup(text)
     results = []
 
     for div in soup.find_all('div', class_='result'):
@@ -326,20 +370,200 @@ def get_baidu_search_results(query, num_results=5):
         if len(results) >= num_results:
             break
 
-    # 并行获取页面内容
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_result = {
-            executor.submit(get_page_content, result['link']): result 
-            for result in results
-        }
-
-        for future in as_completed(future_to_result):
-            result = future_to_result[future]
-            try:
-                content = future.result()
-                result['content'] = content
-            except Exception as e:
-                logging.error(f"获取页面内容失败 ({result['link']}): {e}")
-                result['content'] = "无法获取内容"
+    return results
+
+async def get_google_search_results(query, num_results=5, use_cache=True, fetch_content=True):
+    """
+    获取Google搜索结果，支持高级搜索语法。
+    fetch_content 为 False 时只返回搜索结果页信息，不获取页面内容。
+    """
+    # 处理高级搜索查询
+    advanced_query = build_advanced_query(query, 'Google')
+    
+    # 如果是天气查询,优先搜索360天气网
+    if "天气" in query:
+        advanced_query = f"site:tianqi.so.com {query}"
+    query_encoded = urllib.parse.quote_plus(advanced_query)
+    
+    url = f"{config.GOOGLE_SEARCH_URL}?q={query_encoded}&num={num_results}"
+
+    results = await get_serp_results(
+        'Google', advanced_query, url, parse_google_results, num_results, use_cache
+    )
+
+    # 如果是天气查询,只返回360天气网的结果
+    if "天气" in query:
+        results = [r for r in results if 'tianqi.so.com' in r['link']]
+        if results:
+            results = [results[0]]  # 只保留第一个结果
+
+    # 并发获取页面内容
+    if fetch_content:
+        await fill_page_contents(results, use_cache)
 
     return results
+
+async def get_bing_search_results(query, num_results=5, use_cache=True, fetch_content=True):
+    """
+    获取Bing搜索结果，支持高级搜索语法。
+    fetch_content 为 False 时只返回搜索结果页信息，不获取页面内容。
+    """
+    # 处理高级搜索查询
+    advanced_query = build_advanced_query(query, 'Bing')
+    query_encoded = urllib.parse.quote_plus(advanced_query)
+    
+    url = f"{config.BING_SEARCH_URL}?q={query_encoded}&count={num_results}"
+
+    results = await get_serp_results(
+        'Bing', advanced_query, url, parse_bing_results, num_results, use_cache
+    )
+
+    # 并发获取页面内容
+    if fetch_content:
+        await fill_page_contents(results, use_cache)
+
+    return results
+
+async def get_baidu_search_results(query, num_results=5, use_cache=True, fetch_content=True):
+    """
+    获取百度搜索结果，支持高级搜索语法。
+    fetch_content 为 False 时只返回搜索结果页信息，不获取页面内容。
+    """
+    # 处理高级搜索查询
+    advanced_query = build_advanced_query(query, '百度')
+    query_encoded = urllib.parse.quote_plus(advanced_query)
+    
+    url = f"{config.BAIDU_SEARCH_URL}?wd={query_encoded}&rn={num_results}&ie=utf-8"
+
+    results = await get_serp_results(
+        '百度', advanced_query, url, parse_baidu_results, num_results, use_cache
+    )
+
+    # 并发获取页面内容
+    if fetch_content:
+        await fill_page_contents(results, use_cache)
+
+    return results
+
+# 搜索引擎名称到搜索函数的映射
+SEARCH_ENGINES = {
+    'Google': get_google_search_results,
+    'Bing': get_bing_search_results,
+    '百度': get_baidu_search_results
+}
+
+# URL去重时忽略的跟踪参数
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'spm')
+
+# 倒数排名融合的平滑常数
+RRF_K = 60
+
+def normalize_url(url):
+    """
+    规范化URL用于去重：小写协议和主机，去掉默认端口、片段、末尾斜杠和跟踪参数。
+    """
+    parts = urllib.parse.urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if parts.port and not (scheme, parts.port) in (('http', 80), ('https', 443)):
+        host = f"{host}:{parts.port}"
+
+    query = urllib.parse.urlencode(sorted(
+        (k, v) for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(TRACKING_PARAMS)
+    ))
+    path = parts.path.rstrip('/') or '/'
+    # http 和 https 视为同一页面
+    return urllib.parse.urlunsplit(('', host, path, query, ''))
+
+def fuse_results(result_lists, num_results):
+    """
+    按规范化URL去重，并用倒数排名融合(RRF)合并多个搜索引擎的结果。
+    """
+    fused = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            key = normalize_url(result['link'])
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = {
+                    'result': dict(result, engines=[]),
+                    'score': 0.0,
+                    'best_rank': rank
+                }
+            entry['score'] += 1.0 / (RRF_K + rank)
+            entry['best_rank'] = min(entry['best_rank'], rank)
+            if result['engine'] not in entry['result']['engines']:
+                entry['result']['engines'].append(result['engine'])
+
+    # sorted 是稳定排序，分数和最佳排名相同时保持引擎顺序
+    ranked = sorted(fused.values(), key=lambda e: (-e['score'], e['best_rank']))
+    merged = []
+    for entry in ranked[:num_results]:
+        entry['result']['score'] = round(entry['score'], 6)
+        merged.append(entry['result'])
+    return merged
+
+async def get_multi_engine_results(query, num_results=5, use_cache=True, fetch_content=True, engines=()):
+    """
+    并发查询多个搜索引擎，去重后按倒数排名融合，每个页面只获取一次内容。
+    """
+    responses = await asyncio.gather(
+        *(SEARCH_ENGINES[engine](query, num_results, use_cache, fetch_content=False) for engine in engines),
+        return_exceptions=True
+    )
+
+    result_lists = []
+    for engine, response in zip(engines, responses):
+        if isinstance(response, Exception):
+            logging.error(f"{engine}搜索失败，忽略该引擎的结果: {response}")
+            continue
+        result_lists.append(response)
+
+    # 所有引擎都失败时报告第一个错误
+    if not result_lists:
+        raise responses[0]
+
+    results = fuse_results(result_lists, num_results)
+
+    if fetch_content:
+        await fill_page_contents(results, use_cache)
+
+    return results
+
+async def search_with_fallback(query, num_results=5, use_cache=True, fetch_content=True, engine='Google'):
+    """
+    使用指定的搜索引擎搜索；该引擎熔断、限流或被拦截时改用其他可用的引擎。
+    """
+    try:
+        return await SEARCH_ENGINES[engine](query, num_results, use_cache, fetch_content)
+    except EngineUnavailable as e:
+        for other in SEARCH_ENGINES:
+            if other != engine and engine_breakers.get(other).is_available():
+                logging.warning(f"{engine}不可用，改用{other}搜索: {e}")
+                return await SEARCH_ENGINES[other](query, num_results, use_cache, fetch_content)
+        raise
+
+def get_search_function(engine):
+    """
+    根据请求的 engine 参数返回搜索函数：单个引擎名、引擎名列表或 "all"。
+    单个引擎在启用 ENGINE_FALLBACK 时不可用会自动改用其他引擎。不支持的引擎返回 None。
+    """
+    if engine is None:
+        return None
+    if engine == 'all':
+        engines = list(SEARCH_ENGINES)
+    elif isinstance(engine, str):
+        engines = [engine]
+    else:
+        engines = list(dict.fromkeys(engine))
+
+    if not engines or any(name not in SEARCH_ENGINES for name in engines):
+        return None
+    if len(engines) == 1:
+        if config.ENGINE_FALLBACK:
+            return functools.partial(search_with_fallback, engine=engines[0])
+        return SEARCH_ENGINES[engines[0]]
+    return functools.partial(get_multi_engine_results, engines=engines)
@@ -0,0 +1,77 @@
+# singleflight.py
+import asyncio
+from http_client import DeadlineExceeded, request_deadline
+
+class SingleFlight:
+    """
+    合并相同键的并发调用：同一时刻只有一个调用真正执行，其余调用等待并共享结果。
+    共享的调用不带请求截止时间(上游请求仍受 HTTP_TIMEOUT 限制)，每个调用方只在等待时应用自己的截止时间，
+    避免一个截止时间很短的请求让其他请求的相同调用一起超时。
+    所有等待者都被取消或超时后，共享的调用也随之取消。
+    """
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        self._inflight = {}
+        # 每个共享调用当前的等待者数
+        self._waiters = {}
+
+    async def do(self, key, func, *args):
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            future = asyncio.ensure_future(self._run(func, args))
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._done(key, f))
+
+        self._waiters[future] = self._waiters.get(future, 0) + 1
+        try:
+            return await self._wait(future)
+        finally:
+            self._waiters[future] -= 1
+            if not self._waiters[future]:
+                del self._waiters[future]
+                if not future.done():
+                    # 最后一个等待者已离开，结果没人需要了，取消仍在进行的下载
+                    self.cancelled += 1
+                    if self._inflight.get(key) is future:
+                        del self._inflight[key]
+                    future.cancel()
+
+    async def _wait(self, future):
+        # shield 保证某个等待者被取消或超时时不会中断其他等待者共享的调用
+        deadline = request_deadline.get()
+        if deadline is None:
+            return await asyncio.shield(future)
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(future), deadline - asyncio.get_running_loop().time()
+            )
+        except asyncio.TimeoutError:
+            if future.done():
+                raise
+            raise DeadlineExceeded("已超过请求截止时间") from None
+
+    @staticmethod
+    async def _run(func, args):
+        # 任务运行在创建时复制的上下文中，这里的修改不影响调用方
+        request_deadline.set(None)
+        return await func(*args)
+
+    def _done(self, key, future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        # 所有等待者都已取消时也要取走异常，避免 "exception was never retrieved" 警告
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'cancelled': self.cancelled,
+            'inflight': len(self._inflight)
+        }
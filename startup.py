@@ -0,0 +1,71 @@
+# startup.py
+import time
+import asyncio
+import logging
+import urllib.parse
+import config
+from http_client import get_client
+from search_engines import process_search_query
+from utils import clean_text, extract_page_bytes, get_extract_executor
+
+# 冷启动耗时(秒)：main 模块导入、启动预热，以及第一个 /search 请求的处理时间
+STARTUP_STATS = {'import': None, 'warmup': None, 'first_request': None}
+
+# 预热用的样例页面：不声明编码，使编码探测也走一遍
+_SAMPLE_PAGE = (
+    b'<html><head><title>warm up</title></head><body><nav>menu</nav><article><h1>Warm up</h1>'
+    + b'<p>This paragraph only exists to exercise parsing, encoding detection and extraction.</p>' * 4
+    + b'</article></body></html>'
+)
+_SAMPLE_QUERY = '"warm up" -skip site:example.com filetype:pdf intitle:a inurl:b 1..2 time:last7days'
+
+def record_first_request(seconds):
+    if STARTUP_STATS['first_request'] is None:
+        STARTUP_STATS['first_request'] = round(seconds, 4)
+        logging.info(f"第一个搜索请求耗时 {seconds:.3f}s")
+
+def warm_cpu_paths():
+    """
+    导入 bs4、charset_normalizer 等延迟导入的依赖，并执行一遍查询处理、编码识别、正文提取和文本清理。
+    """
+    process_search_query(_SAMPLE_QUERY)
+    clean_text(extract_page_bytes(_SAMPLE_PAGE, 'text/html')[0])
+
+async def preconnect(url):
+    """
+    向目标站点发送一个 HEAD 请求，使共享连接池提前完成DNS解析、TCP和TLS握手。
+    """
+    parts = urllib.parse.urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}/"
+    try:
+        await get_client().head(origin, timeout=config.WARMUP_TIMEOUT, follow_redirects=False)
+    except Exception as e:
+        logging.warning(f"预热连接失败 ({origin}): {e}")
+
+async def warm_extract_workers():
+    """
+    提前启动全部正文提取进程，每个进程完成一次提取以导入解析依赖。
+    """
+    executor = get_extract_executor()
+    if executor is None:
+        return
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(
+        loop.run_in_executor(executor, extract_page_bytes, _SAMPLE_PAGE, 'text/html')
+        for _ in range(config.EXTRACT_WORKERS)
+    ))
+
+async def warm_up():
+    """
+    启动预热，各项并发执行，返回总耗时(秒)。
+    """
+    started = time.perf_counter()
+    await asyncio.gather(
+        asyncio.to_thread(warm_cpu_paths),
+        warm_extract_workers(),
+        *(preconnect(url) for url in config.WARMUP_URLS)
+    )
+    elapsed = time.perf_counter() - started
+    STARTUP_STATS['warmup'] = round(elapsed, 4)
+    logging.info(f"启动预热耗时 {elapsed:.3f}s")
+    return elapsed
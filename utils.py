@@ -1,9 +1,91 @@
 # utils.py
 import re
+import time
+import codecs
+import urllib.parse
+import asyncio
 import logging
-import requests
-from bs4 import BeautifulSoup
-import charset_normalizer
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import httpx
+import config
+from cache import ContentCache, create_backend
+from http_client import stream, DeadlineExceeded
+from metrics import (
+    CACHE_REQUESTS, DOWNLOADED_BYTES, TIMEOUTS, UPSTREAM_RESPONSES,
+    current_engine, observe_stage, timed_stage, trace_set
+)
+from resilience import (
+    CircuitBreaker, KeyedRegistry, LatencyTracker, TokenBucket, parse_retry_after
+)
+from parsers import make_soup
+from extractor import extract_main_content
+from singleflight import SingleFlight
+
+# 获取或提取失败时返回的提示文本，这些结果不会被缓存
+FAILED_CONTENTS = (
+    "网页请求失败", "网页请求超时", "内容提取失败", "无法提取有效内容",
+    "非HTML内容，无法提取", "页面过大，无法提取", "站点暂时不可用", "无法获取内容"
+)
+
+# 按URL缓存的页面内容
+content_cache = ContentCache(
+    config.CONTENT_CACHE_MAX_BYTES, config.CONTENT_CACHE_TTL,
+    config.CONTENT_CACHE_MAX_AGE, create_backend('content')
+)
+
+# 合并对同一URL的并发请求
+content_flight = SingleFlight()
+
+# 每个内容站点的限流器和熔断器
+host_limiters = KeyedRegistry(
+    lambda: TokenBucket(config.HOST_RATE_LIMIT, config.HOST_RATE_BURST)
+)
+host_breakers = KeyedRegistry(
+    lambda: CircuitBreaker(
+        config.BREAKER_FAILURES, config.BREAKER_WINDOW,
+        config.BREAKER_RECOVERY, config.BREAKER_MAX_RECOVERY
+    )
+)
+
+# 内容请求耗时统计和对冲请求计数
+content_latency = LatencyTracker()
+HEDGE_STATS = {'fetches': 0, 'hedged': 0, 'hedge_wins': 0, 'budget_exhausted': 0}
+
+# 正文提取进程池，按需创建
+_extract_executor = None
+
+# 编码识别：<meta> 嗅探的字节数，以及兜底探测时采样的字节数
+META_SNIFF_BYTES = 4096
+DETECT_SAMPLE_BYTES = 64 * 1024
+
+# clean_text 删除的字符：控制字符、零宽字符、双向文本控制符(U+202A-U+202E)等格式字符；
+# 同一区段内的空白字符(如 U+2028、U+202F)不删除，按空白处理
+_REMOVED_CHARS_RE = re.compile(r'[\x00-\x1F\x7F\u200b-\u200f\u202a-\u202e\u2060-\u206f]+')
+_ENTITY_RE = re.compile(r'&[a-zA-Z]+;')
+
+# 各层级确定编码的次数
+ENCODING_STATS = {'bom': 0, 'header': 0, 'meta': 0, 'detected': 0, 'default': 0}
+
+_CHARSET_RE = re.compile(r'charset\s*=\s*["\']?\s*([\w.:-]+)', re.I)
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.I)
+
+# 常见的错误或过窄的编码声明映射到其超集
+_ENCODING_ALIASES = {
+    'gb2312': 'gb18030',
+    'gbk': 'gb18030',
+    'iso-8859-1': 'cp1252',
+    'latin-1': 'cp1252',
+    'ascii': 'cp1252',
+    'us-ascii': 'cp1252'
+}
+
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16')
+)
 
 def clean_text(text):
     """
@@ -11,139 +93,385 @@ def clean_text(text):
     """
     if not text:
         return ""
-        
-    # 移除控制字符
-    text = re.sub(r'[\x00-\x1F\x7F]', '', text)
-    
-    # 统一空白字符
-    text = re.sub(r'\s+', ' ', text)
-    
-    # 清理多余的换行
-    text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
-    
+
+    # 移除控制字符和特殊Unicode字符
+    text = _REMOVED_CHARS_RE.sub('', text)
+
     # 清理HTML实体
-    text = re.sub(r'&[a-zA-Z]+;', ' ', text)
-    
-    # 清理特殊Unicode字符
-    text = re.sub(r'[\u200b-\u200f\u2028-\u202f\u205f-\u206f]', '', text)
-    
-    return text.strip()
+    if '&' in text:
+        text = _ENTITY_RE.sub(' ', text)
+
+    # 统一空白字符
+    return ' '.join(text.split())
 
-def get_page_content(url):
+def normalize_encoding(name):
+    """
+    校验编码名称，返回Python可用的编码名，无法识别时返回None。
+    """
+    if not name:
+        return None
+    name = name.strip().lower()
+    name = _ENCODING_ALIASES.get(name, name)
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+def resolve_encoding(content, content_type=None):
+    """
+    分层确定字节内容的编码：BOM、HTTP Content-Type 头、前几KB内的 <meta> 声明，
+    都没有时才对有限长度的前缀做编码探测。返回 (编码, 确定编码的层级)。
+    """
+    for bom, encoding in _BOMS:
+        if content.startswith(bom):
+            return encoding, 'bom'
+
+    if content_type:
+        match = _CHARSET_RE.search(content_type)
+        encoding = normalize_encoding(match.group(1)) if match else None
+        if encoding:
+            return encoding, 'header'
+
+    match = _META_CHARSET_RE.search(content[:META_SNIFF_BYTES])
+    if match:
+        encoding = normalize_encoding(match.group(1).decode('ascii', errors='ignore'))
+        if encoding:
+            return encoding, 'meta'
+
+    # 探测库导入较慢，只在前面各层都无法确定编码时导入
+    import charset_normalizer
+    detected = charset_normalizer.from_bytes(content[:DETECT_SAMPLE_BYTES]).best()
+    if detected and detected.encoding:
+        return detected.encoding, 'detected'
+
+    return 'utf-8', 'default'
+
+def decode_content(content, content_type=None):
+    """
+    确定字节内容的编码并解码为文本。
+    """
+    encoding, tier = resolve_encoding(content, content_type)
+    ENCODING_STATS[tier] += 1
+    return content.decode(encoding, errors='replace')
+
+async def get_page_content(url, use_cache=True):
     """
     获取指定URL页面的核心内容，处理编码并保留重要的文本格式。
     智能提取主要内容区域，过滤无关内容。
     """
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/113.0.0.0 Safari/537.36"
-        ),
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
-    }
+    cached = await content_cache.get(url) if use_cache else None
+    if use_cache:
+        result = 'miss' if cached is None else ('hit' if content_cache.is_fresh(cached) else 'stale')
+        CACHE_REQUESTS.inc(cache='content', result=result)
+        trace_set('cache', result)
+    if cached and content_cache.is_fresh(cached):
+        return cached['content']
 
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-
-        # 检查内容类型
-        content_type = response.headers.get('Content-Type', '').lower()
-        if 'text/html' not in content_type and 'application/xhtml+xml' not in content_type:
-            return "非HTML内容，无法提取"
-
-        # 检测编码
-        detected = charset_normalizer.from_bytes(response.content).best()
-        encoding = detected.encoding if detected and detected.encoding else 'utf-8'
-        text = response.content.decode(encoding, errors='replace')
-
-        # 使用Beautiful Soup解析HTML
-        soup = BeautifulSoup(text, 'html.parser')
-
-        # 移除干扰元素
-        noise_tags = [
-            'script', 'style', 'meta', 'link', 'noscript', 'iframe',
-            'header', 'footer', 'nav', 'aside', 'form', 'button',
-            '[class*="menu"]', '[class*="sidebar"]', '[class*="banner"]',
-            '[class*="advertisement"]', '[class*="copyright"]', '[class*="social"]'
-        ]
-        for tag in soup.select(','.join(noise_tags)):
-            tag.decompose()
-
-        # 提取主要内容
-        content_parts = []
-        
-        # 1. 尝试找到主要内容区域
-        main_selectors = [
-            'article', 'main', '[role="main"]', '.main-content', '#content', '#main',
-            '.article', '.post', '.entry', '.blog-post', '.content-main'
-        ]
-        
-        main_content = None
-        for selector in main_selectors:
-            main_content = soup.select_one(selector)
-            if main_content:
-                break
+        return await content_flight.do(url, load_page_content_hedged, url, cached)
+    except DeadlineExceeded:
+        # 本请求的截止时间已到，共享的下载仍为其他请求继续进行
+        TIMEOUTS.inc(stage='content')
+        return "网页请求超时"
 
-        if not main_content:
-            main_content = soup.body if soup.body else soup
+def hedge_delay():
+    """
+    返回发起对冲请求前的等待时间，未启用对冲或样本不足时返回None。
+    """
+    if not config.HEDGE_ENABLED:
+        return None
+    delay = content_latency.percentile(config.HEDGE_PERCENTILE, config.HEDGE_MIN_SAMPLES)
+    if delay is None:
+        return None
+    return max(delay, config.HEDGE_MIN_DELAY)
 
-        # 2. 提取标题
-        title = None
-        title_tags = main_content.find_all(['h1', 'h2'], limit=2)
-        for tag in title_tags:
-            if len(tag.get_text(strip=True)) > 10:
-                title = tag.get_text(strip=True)
-                break
+async def load_page_content_hedged(url, cached=None):
+    """
+    获取页面内容；启用对冲时，请求耗时超过历史百分位仍未完成就再发一次请求，
+    取先成功的结果并取消另一个，两个都失败时返回主请求的结果。对冲请求的比例受 HEDGE_MAX_RATIO 限制。
+    """
+    HEDGE_STATS['fetches'] += 1
+    started = time.perf_counter()
+    delay = hedge_delay()
 
-        if title:
-            content_parts.append(title)
+    first = asyncio.ensure_future(load_page_content(url, cached))
+    tasks = [first]
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                if HEDGE_STATS['hedged'] < HEDGE_STATS['fetches'] * config.HEDGE_MAX_RATIO:
+                    HEDGE_STATS['hedged'] += 1
+                    tasks.append(asyncio.ensure_future(load_page_content(url, cached)))
+                else:
+                    HEDGE_STATS['budget_exhausted'] += 1
 
-        # 3. 提取正文内容
-        content_tags = main_content.find_all(['p', 'h2', 'h3', 'h4', 'h5', 'h6', 'li'])
-        
-        for tag in content_tags:
-            text = tag.get_text(strip=True)
-            # 过滤无效内容
-            if not text or len(text) < 20:
-                continue
-            if any(x in text.lower() for x in ['copyright', '版权所有', '关注我们', '扫描二维码']):
-                continue
-            if re.match(r'^[【\[\(（].*[】\]\)）]$', text):  # 跳过纯标签文本
-                continue
-                
-            # 处理标题标签
-            if tag.name.startswith('h'):
-                content_parts.append(f"\n{text}\n")
-            # 处理列表项
-            elif tag.name == 'li':
-                content_parts.append(f"- {text}")
-            # 处理普通段落
-            else:
-                content_parts.append(text)
+        # 取第一个成功的结果；先返回的失败(被限流、熔断拒绝等)不能顶替另一个可能成功的请求
+        winner = None
+        pending = set(tasks)
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((task for task in tasks if task in done and task.result() not in FAILED_CONTENTS), None)
+        if winner is None:
+            # 都失败时返回主请求的结果
+            return first.result()
 
-        # 4. 如果提取的内容太少，尝试其他方法
-        if len('\n'.join(content_parts)) < 200:
-            # 寻找长文本块
-            for tag in main_content.find_all(['div', 'section']):
-                text = tag.get_text(strip=True)
-                if len(text) > 200 and not any(x in text.lower() for x in ['copyright', '版权所有']):
-                    content_parts.append(text)
-                    break
-
-        # 5. 组合并清理最终内容
-        final_text = '\n\n'.join(content_parts)
-        final_text = clean_text(final_text)
-        
-        # 6. 内容有效性检查
-        if not final_text or len(final_text) < 100:
-            return "无法提取有效内容"
-            
-        return final_text
+        if winner is not first:
+            HEDGE_STATS['hedge_wins'] += 1
+            logging.info(f"对冲请求先完成 ({url})")
+        # 只统计成功请求的耗时，快速失败会拉低对冲阈值
+        content_latency.record(time.perf_counter() - started)
+        return winner.result()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+async def load_page_content(url, cached=None):
+    """
+    下载并提取页面内容；cached 为已过软过期时间的缓存条目时发起条件请求。
+    """
+    # 缓存已过软过期时间时带上校验头发起条件请求
+    headers = {}
+    if cached:
+        if cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        if cached['last_modified']:
+            headers['If-Modified-Since'] = cached['last_modified']
+
+    # 站点熔断或限流时快速失败
+    host = urllib.parse.urlsplit(url).netloc.lower()
+    breaker = host_breakers.get(host)
+    if not breaker.is_available() or not await host_limiters.get(host).acquire(config.RATE_LIMIT_MAX_WAIT):
+        return "站点暂时不可用"
+    if not breaker.allow():
+        return "站点暂时不可用"
+    probe = breaker.probe()
+
+    engine = current_engine.get()
+    try:
+        # 流式读取：先检查响应头，再按上限读取正文
+        with timed_stage('content_fetch', engine):
+            async with stream(url, headers=headers) as response:
+                UPSTREAM_RESPONSES.inc(target='content', status=response.status_code)
+                if response.status_code == 429 or response.status_code >= 500:
+                    breaker.record_failure(parse_retry_after(response.headers.get('Retry-After')))
+                else:
+                    # 站点已正常响应；304、非HTML、页面过大或其他4xx也说明站点可用，半开探测就此结束
+                    breaker.record_success()
+                if cached and response.status_code == 304:
+                    content_cache.touch(url)
+                    return cached['content']
+                response.raise_for_status()
+
+                # 检查内容类型
+                content_type = response.headers.get('Content-Type', '')
+                if 'text/html' not in content_type.lower() and 'application/xhtml+xml' not in content_type.lower():
+                    return "非HTML内容，无法提取"
 
-    except requests.exceptions.RequestException as e:
+                # 声明的大小超过上限时不下载正文
+                content_length = response.headers.get('Content-Length', '')
+                if content_length.isdigit() and int(content_length) > config.CONTENT_MAX_BYTES:
+                    logging.info(f"页面过大，跳过 ({url}): {content_length} 字节")
+                    return "页面过大，无法提取"
+
+                body = await read_limited(response, config.CONTENT_READ_BYTES)
+                DOWNLOADED_BYTES.inc(len(body), target='content')
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+
+        # 解析和提取是CPU密集操作，交给线程或进程池执行以免阻塞事件循环
+        content = await run_extraction(body, content_type, engine)
+        if content not in FAILED_CONTENTS:
+            content_cache.set(url, content, etag, last_modified)
+        return content
+
+    except DeadlineExceeded as e:
+        TIMEOUTS.inc(stage='content')
+        logging.error(f"网页请求超时 ({url}): {e}")
+        return "网页请求超时"
+    except httpx.TimeoutException as e:
+        TIMEOUTS.inc(stage='content')
+        breaker.record_failure()
+        logging.error(f"网页请求超时 ({url}): {e}")
+        return "网页请求超时"
+    except httpx.HTTPStatusError as e:
+        # 429/5xx 已在上面计入熔断，其余状态码说明站点本身可用
+        logging.error(f"网页请求失败 ({url}): {e}")
+        return "网页请求失败"
+    except httpx.HTTPError as e:
+        breaker.record_failure()
         logging.error(f"网页请求失败 ({url}): {e}")
         return "网页请求失败"
     except Exception as e:
         logging.error(f"内容提取失败 ({url}): {e}")
         return "内容提取失败"
+    finally:
+        # 没有得出结论的探测(截止时间已到、被取消)不能让站点一直停在半开状态
+        breaker.release_probe(probe)
+
+async def read_limited(response, limit):
+    """
+    读取响应正文，累计达到 limit 字节后停止读取并截断。
+    截断的HTML仍可解析，前部通常已包含足够的正文内容。
+    """
+    chunks = []
+    size = 0
+    async for chunk in response.aiter_bytes():
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= limit:
+            logging.info(f"页面超过读取上限 {limit} 字节，已截断 ({response.url})")
+            break
+    return b''.join(chunks)[:limit]
+
+def get_extract_executor():
+    """
+    EXTRACT_WORKERS 大于0时返回用于正文提取的进程池，否则返回None（使用线程）。
+    """
+    global _extract_executor
+    if _extract_executor is None and config.EXTRACT_WORKERS > 0:
+        # spawn 方式启动工作进程，避免在已有事件循环和线程的进程中 fork
+        _extract_executor = ProcessPoolExecutor(
+            max_workers=config.EXTRACT_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _extract_executor
+
+def shutdown_extract_executor():
+    global _extract_executor
+    if _extract_executor is not None:
+        _extract_executor.shutdown(wait=False, cancel_futures=True)
+        _extract_executor = None
+
+async def run_extraction(content, content_type=None, engine=''):
+    """
+    在线程或进程池中解码并提取页面正文，网络I/O仍留在事件循环中。
+    """
+    global _extract_executor
+    executor = get_extract_executor()
+    if executor is None:
+        result, tier, timings = await asyncio.to_thread(extract_page_bytes, content, content_type)
+    else:
+        try:
+            result, tier, timings = await asyncio.get_running_loop().run_in_executor(
+                executor, extract_page_bytes, content, content_type
+            )
+        except BrokenProcessPool:
+            # 工作进程异常退出后进程池不可再用，下次调用时重建
+            logging.error("正文提取进程池已损坏，将重新创建")
+            _extract_executor = None
+            raise
+    ENCODING_STATS[tier] += 1
+    observe_stage('content_decode', engine, timings[0])
+    observe_stage('content_extract', engine, timings[1])
+    return result
+
+def extract_page_bytes(content, content_type=None):
+    """
+    解码原始HTML字节并提取核心文本内容，
+    返回 (提取结果, 确定编码的层级, (解码耗时, 提取耗时))。
+    可在进程池中执行，只依赖参数，不修改进程内状态。
+    """
+    started = time.perf_counter()
+    encoding, tier = resolve_encoding(content, content_type)
+    text = content.decode(encoding, errors='replace')
+    decoded = time.perf_counter()
+    result = extract_page_content(text)
+    return result, tier, (decoded - started, time.perf_counter() - decoded)
+
+def extract_page_content(text):
+    """
+    从HTML文本中提取核心文本内容。
+    默认使用单次遍历的文本密度提取器，EXTRACTOR=legacy 时使用原来的多次选择器提取。
+    """
+    # 解析HTML
+    soup = make_soup(text)
+
+    if config.EXTRACTOR == 'legacy':
+        final_text = clean_text('\n\n'.join(extract_parts_legacy(soup)))
+    else:
+        final_text = clean_text(' '.join(extract_main_content(soup)))
+
+    # 内容有效性检查
+    if not final_text or len(final_text) < 100:
+        return "无法提取有效内容"
+
+    return final_text
+
+def extract_parts_legacy(soup):
+    """
+    原来的提取方式：删除干扰元素后按选择器查找主要内容区域，再逐个查找标题和正文标签。
+    """
+    # 移除干扰元素
+    noise_tags = [
+        'script', 'style', 'meta', 'link', 'noscript', 'iframe',
+        'header', 'footer', 'nav', 'aside', 'form', 'button',
+        '[class*="menu"]', '[class*="sidebar"]', '[class*="banner"]',
+        '[class*="advertisement"]', '[class*="copyright"]', '[class*="social"]'
+    ]
+    for tag in soup.select(','.join(noise_tags)):
+        tag.decompose()
+
+    # 提取主要内容
+    content_parts = []
+    
+    # 1. 尝试找到主要内容区域
+    main_selectors = [
+        'article', 'main', '[role="main"]', '.main-content', '#content', '#main',
+        '.article', '.post', '.entry', '.blog-post', '.content-main'
+    ]
+    
+    main_content = None
+    for selector in main_selectors:
+        main_content = soup.select_one(selector)
+        if main_content:
+            break
+
+    if not main_content:
+        main_content = soup.body if soup.body else soup
+
+    # 2. 提取标题
+    title = None
+    title_tags = main_content.find_all(['h1', 'h2'], limit=2)
+    for tag in title_tags:
+        if len(tag.get_text(strip=True)) > 10:
+            title = tag.get_text(strip=True)
+            break
+
+    if title:
+        content_parts.append(title)
+
+    # 3. 提取正文内容
+    content_tags = main_content.find_all(['p', 'h2', 'h3', 'h4', 'h5', 'h6', 'li'])
+    
+    for tag in content_tags:
+        text = tag.get_text(strip=True)
+        # 过滤无效内容
+        if not text or len(text) < 20:
+            continue
+        if any(x in text.lower() for x in ['copyright', '版权所有', '关注我们', '扫描二维码']):
+            continue
+        if re.match(r'^[【\[\(（].*[】\]\)）]$', text):  # 跳过纯标签文本
+            continue
+            
+        # 处理标题标签
+        if tag.name.startswith('h'):
+            content_parts.append(f"\n{text}\n")
+        # 处理列表项
+        elif tag.name == 'li':
+            content_parts.append(f"- {text}")
+        # 处理普通段落
+        else:
+            content_parts.append(text)
+
+    # 4. 如果提取的内容太少，尝试其他方法
+    if len('\n'.join(content_parts)) < 200:
+        # 寻找长文本块
+        for tag in main_content.find_all(['div', 'section']):
+            text = tag.get_text(strip=True)
+            if len(text) > 200 and not any(x in text.lower() for x in ['copyright', '版权所有']):
+                content_parts.append(text)
+                break
+
+    return content_parts